@@ -2,14 +2,16 @@
 # -*- coding: utf-8 -*-
 
 import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
 import os
 import time
 import random
 import re
 import argparse
+import threading
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from urllib.parse import urljoin
+from urllib.parse import urljoin, urlparse
+from urllib3.util.retry import Retry
 import zipfile
 from PIL import Image
 import io
@@ -18,8 +20,15 @@ from rich.table import Table
 from rich.live import Live
 from rich.text import Text
 
+try:
+    import lxml
+    HTML_PARSER = 'lxml'
+except ImportError:
+    HTML_PARSER = 'html.parser'
+
 console = Console()
-download_status = {}
+download_status = {status: {} for status in ["等待下载", "正在下载", "下载完成", "跳过，本地已存在"]}
+album_status = {}
 total_albums_count = 0
 processed_albums_count = 0
 
@@ -27,13 +36,77 @@ HEADERS = {
     'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
 }
 
+TAG_ID_RE = re.compile(r'/b/(\d+)/?')
+PAGE_NUM_RE = re.compile(r'_([0-9]+)\.html')
+DOWNLOAD_TEXT_RE = re.compile(r'点击打包下载本套图|µã»÷´ò°üÏÂÔØ±¾Ì×Í¼')
+UNSAFE_CHARS_RE = re.compile(r'[\\/:*?"<>|]')
+
+TAGS_ONLY = SoupStrainer('ul')
+LISTING_ONLY = SoupStrainer('div', class_=['m-list', 'page'])
+DOWNLOAD_ONLY = SoupStrainer('div', class_='Title111')
+
+HOST_RATE = 0.5
+HOST_BURST = 2
+
 session = requests.Session()
-session.mount('http://', requests.adapters.HTTPAdapter(pool_connections=20, pool_maxsize=20))
-session.mount('https://', requests.adapters.HTTPAdapter(pool_connections=20, pool_maxsize=20))
+retry = Retry(
+    total=5,
+    backoff_factor=1,
+    status_forcelist=[429, 500, 502, 503, 504],
+    allowed_methods=["GET"],
+    respect_retry_after_header=True,
+    raise_on_status=False
+)
+adapter = requests.adapters.HTTPAdapter(pool_connections=20, pool_maxsize=50, max_retries=retry)
+session.mount('http://', adapter)
+session.mount('https://', adapter)
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+    def acquire(self):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.last) * self.rate)
+            self.last = now
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        if wait > 0:
+            time.sleep(wait)
+    def penalize(self, delay):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.last) * self.rate)
+            self.last = now
+            self.tokens = min(self.tokens, 0) - delay * self.rate
+
+host_buckets = {}
+host_buckets_lock = threading.Lock()
+
+def fetch(url, **kwargs):
+    host = urlparse(url).netloc
+    with host_buckets_lock:
+        bucket = host_buckets.get(host)
+        if bucket is None:
+            bucket = host_buckets[host] = TokenBucket(HOST_RATE, HOST_BURST)
+    bucket.acquire()
+    response = session.get(url, headers=HEADERS, **kwargs)
+    if response.status_code in (429, 503):
+        retry_after = response.headers.get('Retry-After', '')
+        bucket.penalize(int(retry_after) if retry_after.isdigit() else 10)
+    return response
 
 def update_download_status(album_name, status, progress=0, tag_name="", speed=0):
     global download_status
-    download_status[album_name] = {
+    old_status = album_status.get(album_name)
+    if old_status is not None and old_status != status:
+        download_status[old_status].pop(album_name, None)
+    album_status[album_name] = status
+    download_status.setdefault(status, {})[album_name] = {
         'tag': tag_name,
         'status': status,
         'progress': progress,
@@ -55,11 +128,7 @@ def create_status_table():
     table.add_column("进度", width=15, style="yellow")
     table.add_column("速度", width=15, style="red")
     table.add_column("状态", width=20, style="blue")
-    status_order = {"等待下载": 0, "正在下载": 1, "下载完成": 2, "跳过，本地已存在": 3}
-    sorted_albums = sorted(
-        download_status.items(),
-        key=lambda x: (status_order.get(x[1]['status'], 4), x[0])
-    )
+    sorted_albums = [item for bucket in list(download_status.values()) for item in list(bucket.items())]
     if sorted_albums:
         for album_name, status_info in sorted_albums:
             if status_info['status'] in ["正在下载", "下载完成", "跳过，本地已存在"]:
@@ -101,11 +170,11 @@ def create_status_table():
         )
     return table
 
-def get_soup(url):
+def get_soup(url, parse_only=None):
     try:
-        response = session.get(url, headers=HEADERS, timeout=30)
-        response.encoding = 'gb2312'
-        return BeautifulSoup(response.text, 'html.parser')
+        response = fetch(url, timeout=30)
+        html = response.content.decode('gb18030', errors='replace')
+        return BeautifulSoup(html, HTML_PARSER, parse_only=parse_only)
     except Exception as e:
         console.print(f"[red]获取页面 {url} 失败: {e}[/red]")
         return None
@@ -113,7 +182,7 @@ def get_soup(url):
 def get_tags():
     tags = []
     url = 'https://www.ku1372.cc/b/tag/'
-    soup = get_soup(url)
+    soup = get_soup(url, TAGS_ONLY)
     if not soup:
         return tags
     ul_list = soup.find_all('ul')
@@ -132,90 +201,93 @@ def get_tags():
                 })
     return tags
 
-def get_albums(tag_url):
+def parse_listing(soup, page):
     albums = []
-    page = 1
-    while True:
-        if page == 1:
-            url = tag_url
-        else:
-            import re
-            tag_id_match = re.search(r'/b/(\d+)/?', tag_url)
-            if tag_id_match:
-                tag_id = tag_id_match.group(1)
-                if tag_url.endswith('/'):
-                    url = f"{tag_url}list_{tag_id}_{page}.html"
-                else:
-                    url = f"{tag_url}/list_{tag_id}_{page}.html"
-            else:
-                if tag_url.endswith('/'):
-                    url = f"{tag_url}list_{page}.html"
-                else:
-                    url = f"{tag_url}/list_{page}.html"
-        soup = get_soup(url)
-        if not soup:
-            break
-        list_div = soup.find('div', class_='m-list')
-        if not list_div:
-            break
-        li_list = list_div.find_all('li')
-        if not li_list:
-            break
-        for li in li_list:
+    list_div = soup.find('div', class_='m-list')
+    if list_div:
+        for li in list_div.find_all('li'):
             a_tag = li.find('a')
             if a_tag:
-                album_url = a_tag.get('href')
                 album_name = a_tag.get('title', '').strip()
-                albums.append({
-                    'name': album_name,
-                    'url': album_url
-                })
-        page_div = soup.find('div', class_='page')
-        if not page_div:
-            print(f"未找到分页控件，结束爬取 (第{page}页)")
-            break
-        next_page = None
-        text_matches = page_div.find_all('a')
-        for a in text_matches:
+                if album_name:
+                    albums.append({
+                        'name': album_name,
+                        'url': a_tag.get('href')
+                    })
+    has_next = False
+    page_div = soup.find('div', class_='page')
+    if page_div:
+        page_links = page_div.find_all('a')
+        for a in page_links:
             a_text = a.text.strip()
             if a_text in ['下一页', 'ÏÂÒ»Ò³', 'Next', 'next'] or '下一页' in a_text:
-                next_page = a
+                has_next = True
                 break
-        if not next_page:
-            href_matches = page_div.find_all('a', href=re.compile(r'list_'))
-            for a in href_matches:
-                if 'this-page' not in a.get('class', []):
-                    page_match = re.search(r'_([0-9]+)\.html', a.get('href', ''))
-                    if page_match:
-                        link_page = int(page_match.group(1))
-                        if link_page == page + 1:
-                            next_page = a
-                            break
-        if not next_page:
-            print(f"未找到下一页链接，结束爬取 (第{page}页)")
+        if not has_next:
+            for a in page_links:
+                href = a.get('href', '')
+                if 'list_' in href and 'this-page' not in a.get('class', []):
+                    page_match = PAGE_NUM_RE.search(href)
+                    if page_match and int(page_match.group(1)) == page + 1:
+                        has_next = True
+                        break
+    return albums, has_next
+
+def iter_albums(tag_url):
+    base_url = tag_url.rstrip('/')
+    tag_id_match = TAG_ID_RE.search(tag_url)
+    if tag_id_match:
+        page_url_tmpl = f"{base_url}/list_{tag_id_match.group(1)}_{{page}}.html"
+    else:
+        page_url_tmpl = f"{base_url}/list_{{page}}.html"
+    page = 1
+    while True:
+        console.print(f"[yellow]正在爬取第 {page} 页相册...[/yellow]")
+        url = tag_url if page == 1 else page_url_tmpl.format(page=page)
+        soup = get_soup(url, LISTING_ONLY)
+        if not soup:
+            console.print(f"[red]爬取第 {page} 页失败[/red]")
+            break
+        page_albums, has_next = parse_listing(soup, page)
+        if not page_albums:
+            console.print(f"[red]第 {page} 页未找到相册[/red]")
+            break
+        console.print(f"[green]第 {page} 页找到 {len(page_albums)} 个相册[/green]")
+        yield page, page_albums
+        if not has_next:
+            console.print(f"[yellow]第 {page} 页未找到下一页链接，结束该标签爬取[/yellow]")
             break
         page += 1
-        print(f"准备爬取下一页: 第{page}页")
-        time.sleep(random.randint(4, 8))
-    return albums
+        console.print(f"[cyan]准备爬取下一页: 第 {page} 页[/cyan]")
+
+def get_albums(tag_url):
+    return [album for _, page_albums in iter_albums(tag_url) for album in page_albums]
 
 def get_download_link(album_url):
-    soup = get_soup(album_url)
+    soup = get_soup(album_url, DOWNLOAD_ONLY)
     if not soup:
         return None
     title_div = soup.find('div', class_='Title111')
     if not title_div:
         return None
-    download_a = title_div.find('a', text=re.compile(r'点击打包下载本套图|µã»÷´ò°üÏÂÔØ±¾Ì×Í¼'))
+    download_a = title_div.find('a', text=DOWNLOAD_TEXT_RE)
     if download_a:
         return download_a.get('href')
     return None
 
-def extract_zip(zip_path, extract_dir, delete_after=False):
+def extract_zip(zip_path, extract_dir, delete_after=False, verify=False):
     try:
+        extracted_paths = []
         with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-            zip_ref.extractall(extract_dir)
+            for info in zip_ref.infolist():
+                extracted_paths.append(zip_ref.extract(info, extract_dir))
         print(f"解压成功: {os.path.basename(zip_path)}")
+        if verify:
+            image_paths = [path for path in extracted_paths if path.lower().endswith(('.jpg', '.jpeg', '.png', '.gif'))]
+            bad_count = sum(1 for path in image_paths if not verify_image(path))
+            if bad_count:
+                print(f"校验发现 {bad_count} 张损坏图片，保留原压缩包: {os.path.basename(zip_path)}")
+                return False
         if delete_after:
             os.remove(zip_path)
             print(f"删除原压缩包: {os.path.basename(zip_path)}")
@@ -224,6 +296,12 @@ def extract_zip(zip_path, extract_dir, delete_after=False):
         print(f"解压失败 {os.path.basename(zip_path)}: {e}")
         return False
 
+def extract_zips_in_dir(dir_path, delete_after=False, verify=False):
+    for file in os.listdir(dir_path):
+        if file.endswith('.zip'):
+            zip_path = os.path.join(dir_path, file)
+            extract_zip(zip_path, dir_path, delete_after, verify)
+
 def verify_image(image_path):
     try:
         with Image.open(image_path) as img:
@@ -233,9 +311,22 @@ def verify_image(image_path):
         print(f"图像损坏: {image_path} - {e}")
         return False
 
+completed_lock = threading.Lock()
+
+def load_completed(path):
+    if not os.path.exists(path):
+        return set()
+    with open(path, 'r', encoding='utf-8') as f:
+        return {line.strip() for line in f if line.strip()}
+
+def record_completed(path, album_url):
+    with completed_lock:
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(album_url + '\n')
+
 def main():
     parser = argparse.ArgumentParser(description='爬取ku1372网站相册')
-    parser.add_argument('--verify', action='store_true', help='启用已存在文件验证')
+    parser.add_argument('--verify', action='store_true', help='启用文件验证：检查已存在的压缩包，并在解压后用PIL逐张校验图片（解压会明显变慢）')
     parser.add_argument('--max-workers', type=int, default=2, help='最大下载线程数')
     args = parser.parse_args()
     default_path = r"E:\pachong\结果\ku1372"
@@ -243,6 +334,8 @@ def main():
     if not save_path:
         save_path = default_path
     os.makedirs(save_path, exist_ok=True)
+    completed_file = os.path.join(save_path, 'completed_albums.txt')
+    completed_urls = load_completed(completed_file)
     console.print("\n=== 解压选项设置 ===")
     extract_choice = input("全站下载完成后是否解压压缩包？(y/n，默认y): ").strip().lower()
     should_extract = extract_choice in ['y', '']
@@ -256,151 +349,122 @@ def main():
         return
     console.print(f"\n[bold cyan]共找到 {len(tags)} 个标签[/bold cyan]")
     total_success = 0
-    with Live(None, refresh_per_second=2, console=console) as live:
-        def render_content():
-            from rich.console import Group
-            table = create_status_table()
-            group = Group(
-                get_stats_text(),
-                "",
-                table
-            )
-            return group
-        live.update(render_content())
+    def render_content():
+        from rich.console import Group
+        table = create_status_table()
+        group = Group(
+            get_stats_text(),
+            "",
+            table
+        )
+        return group
+    with Live(get_renderable=render_content, refresh_per_second=2, console=console):
         for tag_index, tag in enumerate(tags):
             tag_name = tag['name']
             console.print(f"\n[bold magenta]=== 开始处理标签 {tag_index+1}/{len(tags)}: {tag_name} ===[/bold magenta]")
             tag_dir = os.path.join(save_path, tag_name)
             os.makedirs(tag_dir, exist_ok=True)
-            page = 1
-            has_more_pages = True
-            while has_more_pages:
-                console.print(f"[yellow]正在爬取第 {page} 页相册...[/yellow]")
-                if page == 1:
-                    current_url = tag['url']
-                else:
-                    tag_id_match = re.search(r'/b/(\d+)/?', tag['url'])
-                    if tag_id_match:
-                        tag_id = tag_id_match.group(1)
-                        if tag['url'].endswith('/'):
-                            current_url = f"{tag['url']}list_{tag_id}_{page}.html"
-                        else:
-                            current_url = f"{tag['url']}/list_{tag_id}_{page}.html"
-                    else:
-                        console.print(f"[red]无法提取tag_id，跳过第 {page} 页[/red]")
-                        break
-                soup = get_soup(current_url)
-                if not soup:
-                    console.print(f"[red]爬取第 {page} 页失败[/red]")
-                    break
-                list_div = soup.find('div', class_='m-list')
-                if not list_div:
-                    console.print(f"[red]第 {page} 页未找到相册列表[/red]")
-                    break
-                li_list = list_div.find_all('li')
-                if not li_list:
-                    console.print(f"[red]第 {page} 页未找到相册[/red]")
-                    break
-                console.print(f"[green]第 {page} 页找到 {len(li_list)} 个相册[/green]")
-                current_page_albums = []
-                for li in li_list:
-                    a_tag = li.find('a')
-                    if a_tag:
-                        album_url = a_tag.get('href')
-                        album_name = a_tag.get('title', '').strip()
-                        if album_name:
-                            current_page_albums.append({
-                                'name': album_name,
-                                'url': album_url
-                            })
+            existing_sizes = {entry.name: entry.stat().st_size for entry in os.scandir(tag_dir) if entry.is_file()}
+            for page, current_page_albums in iter_albums(tag['url']):
                 for album in current_page_albums:
                     global total_albums_count
                     total_albums_count += 1
                     update_download_status(album['name'], "等待下载", 0, tag_name)
-                    live.update(render_content())
                 thread_success_count = 0
+                success_lock = threading.Lock()
                 def download_album_wrapper(album, tag_dir, verify=False, tag_name=""):
                     nonlocal thread_success_count
                     album_name = album['name']
                     album_url = album['url']
-                    safe_name = re.sub(r'[\\/:*?"<>|]', '_', album_name)
+                    safe_name = UNSAFE_CHARS_RE.sub('_', album_name)
                     save_path = os.path.join(tag_dir, f"{safe_name}.zip")
-                    if os.path.exists(save_path):
+                    if album_url in completed_urls and not verify:
+                        update_download_status(album_name, "跳过，本地已存在", 100, tag_name)
+                        console.print(f"[green]跳过，已下载完成: {safe_name}[/green]")
+                        return True
+                    existing_size = existing_sizes.get(f"{safe_name}.zip")
+                    if existing_size is not None:
                         if verify:
                             update_download_status(album_name, "正在下载", 0, tag_name)
-                            live.update(render_content())
                             console.print(f"[yellow]验证已存在文件: {safe_name}[/yellow]")
-                            if os.path.getsize(save_path) > 1024:
+                            if existing_size > 1024:
                                 update_download_status(album_name, "跳过，本地已存在", 100, tag_name)
-                                live.update(render_content())
                                 return True
                             else:
                                 console.print(f"[orange]文件已存在但无效，重新下载: {safe_name}[/orange]")
                                 os.remove(save_path)
                         else:
                             update_download_status(album_name, "跳过，本地已存在", 100, tag_name)
-                            live.update(render_content())
                             console.print(f"[green]跳过，本地已存在: {safe_name}[/green]")
                             return True
                     retry_count = 0
                     max_retries = 5
+                    download_url = None
                     while retry_count < max_retries:
                         try:
-                            download_url = get_download_link(album_url)
+                            if not download_url:
+                                download_url = get_download_link(album_url)
                             if not download_url:
                                 update_download_status(album_name, "下载完成", 0, tag_name)
-                                live.update(render_content())
                                 console.print(f"[red]获取下载链接失败: {album_name}[/red]")
                                 return False
-                            delay = random.randint(2, 4)
-                            console.print(f"[blue]等待 {delay} 秒后下载: {album_name}[/blue]")
-                            time.sleep(delay)
                             update_download_status(album_name, "正在下载", 0, tag_name)
-                            live.update(render_content())
                             console.print(f"[green]正在下载: {album_name} (尝试 {retry_count+1}/{max_retries})[/green]")
-                            response = session.get(download_url, headers=HEADERS, stream=True, timeout=60)
+                            response = fetch(download_url, stream=True, timeout=60)
                             response.raise_for_status()
                             total_size = int(response.headers.get('content-length', 0))
+                            content_type = response.headers.get('Content-Type', '').lower()
+                            if content_type.startswith('text/html') or 0 < total_size < 2048:
+                                response.close()
+                                update_download_status(album_name, "等待下载", 0, tag_name)
+                                console.print(f"[red]下载失败，返回HTML错误页或内容过小 ({total_size} bytes): {album_name}[/red]")
+                                download_url = None
+                                retry_count += 1
+                                time.sleep(random.randint(4, 8))
+                                continue
                             console.print(f"[cyan]文件大小: {total_size / 1024 / 1024:.2f} MB[/cyan]")
                             downloaded_size = 0
-                            start_time = time.time()
-                            last_update_time = start_time
-                            with open(save_path, 'wb') as f:
-                                for chunk in response.iter_content(chunk_size=8192):
+                            start_time = time.monotonic()
+                            next_report_time = start_time + 1.0
+                            last_report_time = start_time
+                            last_report_size = 0
+                            header = b''
+                            is_html_page = False
+                            with response, open(save_path, 'wb', buffering=1024 * 1024) as f:
+                                for chunk in response.iter_content(chunk_size=128 * 1024):
                                     if chunk:
+                                        if not header:
+                                            header = chunk[:512]
+                                            is_html_page = b'<!DOCTYPE html>' in header or b'<html>' in header or b'<head>' in header
+                                            if is_html_page:
+                                                break
                                         f.write(chunk)
                                         downloaded_size += len(chunk)
-                                        current_time = time.time()
-                                        elapsed_time = current_time - start_time
-                                        if current_time - last_update_time >= 1.0 and total_size > 0:
+                                        current_time = time.monotonic()
+                                        if current_time >= next_report_time and total_size > 0:
                                             progress = (downloaded_size / total_size) * 100
-                                            if elapsed_time > 0:
-                                                speed_kbps = (downloaded_size / elapsed_time) / 1024
-                                            else:
-                                                speed_kbps = 0
+                                            speed_kbps = (downloaded_size - last_report_size) / (current_time - last_report_time) / 1024
                                             update_download_status(album_name, "正在下载", progress, tag_name, speed_kbps)
-                                            live.update(render_content())
-                                            last_update_time = current_time
-                            final_time = time.time()
+                                            last_report_time = current_time
+                                            last_report_size = downloaded_size
+                                            next_report_time = current_time + 1.0
+                            final_time = time.monotonic()
                             total_elapsed = final_time - start_time
                             if total_elapsed > 0:
                                 avg_speed_kbps = (downloaded_size / total_elapsed) / 1024
                                 console.print(f"[cyan]平均下载速度: {avg_speed_kbps:.2f} KB/s[/cyan]")
-                            with open(save_path, 'rb') as f:
-                                content = f.read(512)
-                                if b'<!DOCTYPE html>' in content or b'<html>' in content or b'<head>' in content:
-                                    update_download_status(album_name, "等待下载", 0, tag_name)
-                                    live.update(render_content())
-                                    console.print(f"[red]下载失败，返回HTML错误页: {album_name}[/red]")
-                                    os.remove(save_path)
-                                    retry_count += 1
-                                    time.sleep(random.randint(4, 8))
-                                    continue
-                            final_size = os.path.getsize(save_path)
+                            if is_html_page:
+                                update_download_status(album_name, "等待下载", 0, tag_name)
+                                console.print(f"[red]下载失败，返回HTML错误页: {album_name}[/red]")
+                                os.remove(save_path)
+                                download_url = None
+                                retry_count += 1
+                                time.sleep(random.randint(4, 8))
+                                continue
+                            final_size = downloaded_size
                             console.print(f"[cyan]实际下载大小: {final_size / 1024 / 1024:.2f} MB[/cyan]")
                             if final_size < 1024:
                                 update_download_status(album_name, "等待下载", 0, tag_name)
-                                live.update(render_content())
                                 console.print(f"[red]下载失败，文件太小 ({final_size} bytes): {album_name}[/red]")
                                 os.remove(save_path)
                                 retry_count += 1
@@ -408,20 +472,26 @@ def main():
                                 continue
                             if total_size > 0 and abs(final_size - total_size) > 1024:
                                 update_download_status(album_name, "等待下载", 0, tag_name)
-                                live.update(render_content())
                                 console.print(f"[red]下载失败，文件大小不匹配 (预期: {total_size}, 实际: {final_size}): {album_name}[/red]")
                                 os.remove(save_path)
                                 retry_count += 1
                                 time.sleep(random.randint(4, 8))
                                 continue
+                            existing_sizes[f"{safe_name}.zip"] = final_size
+                            record_completed(completed_file, album_url)
                             update_download_status(album_name, "下载完成", 100, tag_name)
-                            live.update(render_content())
                             console.print(f"[green]✓ 下载成功: {album_name}[/green]")
-                            thread_success_count += 1
+                            with success_lock:
+                                thread_success_count += 1
                             return True
+                        except requests.exceptions.HTTPError as e:
+                            if e.response is not None:
+                                e.response.close()
+                            update_download_status(album_name, "下载完成", 0, tag_name)
+                            console.print(f"[red]✗ 专辑 {album_name} 下载失败，服务器返回错误: {e}[/red]")
+                            return False
                         except requests.exceptions.RequestException as e:
                             update_download_status(album_name, "等待下载", 0, tag_name)
-                            live.update(render_content())
                             console.print(f"[red]网络请求失败 (尝试 {retry_count+1}/{max_retries}): {e}[/red]")
                             retry_count += 1
                             if os.path.exists(save_path):
@@ -429,14 +499,12 @@ def main():
                             time.sleep(random.randint(4, 8))
                         except Exception as e:
                             update_download_status(album_name, "等待下载", 0, tag_name)
-                            live.update(render_content())
                             console.print(f"[red]下载专辑 {album_name} 失败 (尝试 {retry_count+1}/{max_retries}): {e}[/red]")
                             retry_count += 1
                             if os.path.exists(save_path):
                                 os.remove(save_path)
                             time.sleep(random.randint(4, 8))
                     update_download_status(album_name, "下载完成", 0, tag_name)
-                    live.update(render_content())
                     console.print(f"[red]✗ 专辑 {album_name} 下载失败，已重试5次[/red]")
                     return False
                 console.print(f"[green]使用 {args.max_workers} 个线程下载当前页相册[/green]")
@@ -453,38 +521,14 @@ def main():
                             console.print(f"[red]处理相册 {album['name']} 时发生异常: {e}[/red]")
                         global processed_albums_count
                         processed_albums_count += 1
-                        live.update(render_content())
                 total_success += thread_success_count
-                time.sleep(random.randint(2, 5))
-                page_div = soup.find('div', class_='page')
-                if not page_div:
-                    console.print(f"[yellow]第 {page} 页未找到分页控件，结束该标签爬取[/yellow]")
-                    has_more_pages = False
-                    break
-                next_page = None
-                text_matches = page_div.find_all('a')
-                for a in text_matches:
-                    a_text = a.text.strip()
-                    if a_text in ['下一页', 'ÏÂÒ»Ò³', 'Next', 'next'] or '下一页' in a_text:
-                        next_page = a
-                        break
-                if not next_page:
-                    console.print(f"[yellow]第 {page} 页未找到下一页链接，结束该标签爬取[/yellow]")
-                    has_more_pages = False
-                    break
-                page += 1
-                console.print(f"[cyan]准备爬取下一页: 第 {page} 页[/cyan]")
-                time.sleep(random.randint(4, 8))
             console.print(f"[bold magenta]=== 标签 {tag_index+1}/{len(tags)} 处理完成 ===[/bold magenta]")
     if should_extract:
         console.print("\n[bold blue]=== 开始解压压缩包 ===[/bold blue]")
-        for tag in tags:
-            tag_dir = os.path.join(save_path, tag['name'])
-            if os.path.exists(tag_dir):
-                for file in os.listdir(tag_dir):
-                    if file.endswith('.zip'):
-                        zip_path = os.path.join(tag_dir, file)
-                        extract_zip(zip_path, tag_dir, delete_after)
+        tag_dirs = [os.path.join(save_path, tag['name']) for tag in tags]
+        tag_dirs = [tag_dir for tag_dir in tag_dirs if os.path.exists(tag_dir)]
+        with ThreadPoolExecutor(max_workers=os.cpu_count() or 4) as executor:
+            list(executor.map(lambda tag_dir: extract_zips_in_dir(tag_dir, delete_after, args.verify), tag_dirs))
     console.print(f"\n[bold green]=== 下载完成 ===[/bold green]")
     console.print(f"[cyan]总标签数: {len(tags)}[/cyan]")
     console.print(f"[green]总成功下载数: {total_success}[/green]")
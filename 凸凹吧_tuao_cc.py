@@ -71,6 +71,10 @@ DEFAULT_ALBUM_SLEEP_MIN = 4.0      # 专辑详情页请求延迟最小值
 DEFAULT_ALBUM_SLEEP_MAX = 8.0      # 专辑详情页请求延迟最大值
 DEFAULT_POOL_SIZE = 64             # 连接池大小
 
+# 列表页分页区块，用于在不解析整页的情况下定位下一页链接
+# class值中pagination必须是完整的类名（前后为空白或引号），不匹配pagination-wrap等
+PAGINATION_RE = re.compile(r'<ul[^>]*class=(["\'])(?:[^"\']*\s)?pagination(?:\s[^"\']*)?\1[^>]*>.*?</ul>', re.S | re.I)
+
 # -------- 日志设置 --------
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
@@ -183,12 +187,8 @@ def save_bytes_atomic(path: str, data: bytes) -> bool:
         return False
 
 # -------- 解析函数 --------
-def parse_next_page(soup: BeautifulSoup) -> Optional[str]:
-    """从当前页面解析出下一页链接"""
-    pagination = soup.find("ul", class_="pagination")
-    if not pagination:
-        return None
-    
+def _find_next_link(pagination: Any) -> Optional[str]:
+    """在分页区块中查找下一页链接"""
     # 查找下一页链接的几种方法
     next_page = None
     
@@ -214,6 +214,21 @@ def parse_next_page(soup: BeautifulSoup) -> Optional[str]:
     
     return None
 
+def parse_next_page(html: str) -> Optional[str]:
+    """从当前页面解析出下一页链接"""
+    # 先用正则截取分页区块，只解析这一小段HTML；截取不到或从中找不到下一页时再解析整页
+    match = PAGINATION_RE.search(html)
+    if match:
+        pagination = BeautifulSoup(match.group(0), "html.parser").find("ul", class_="pagination")
+        next_link = _find_next_link(pagination) if pagination else None
+        if next_link:
+            return next_link
+    
+    pagination = BeautifulSoup(html, "html.parser").find("ul", class_="pagination")
+    if not pagination:
+        return None
+    return _find_next_link(pagination)
+
 def parse_albums_on_listing_page(html: str, base_url: str) -> List[Tuple[str, str]]:
     """从列表页HTML中解析出(标题, URL)元组列表。"""
     soup = BeautifulSoup(html, "html.parser")
@@ -533,7 +548,6 @@ def main():
                 continue
             
             # 解析当前页的相册
-            soup = BeautifulSoup(list_html, "html.parser")
             current_page_albums = parse_albums_on_listing_page(list_html, BASE_URL)
             
             # 新增：提取当前页面的所有专辑URL
@@ -566,7 +580,7 @@ def main():
             previous_page_album_urls = current_page_album_urls
             
             # 检查下一页
-            next_page_url = parse_next_page(soup)
+            next_page_url = parse_next_page(list_html)
             if next_page_url:
                 current_url = urljoin(BASE_URL, next_page_url)
                 page_count += 1
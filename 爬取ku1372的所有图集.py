@@ -2,14 +2,16 @@
 # -*- coding: utf-8 -*-
 
 import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
 import os
 import time
 import random
 import re
 import argparse
+import threading
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from urllib.parse import urljoin
+from urllib.parse import urljoin, urlparse
+from urllib3.util.retry import Retry
 import zipfile
 from PIL import Image
 import io
@@ -18,11 +20,21 @@ from rich.table import Table
 from rich.live import Live
 from rich.text import Text
 
+# 优先使用C实现的lxml解析器，未安装时回退到html.parser
+try:
+    import lxml
+    HTML_PARSER = 'lxml'
+except ImportError:
+    HTML_PARSER = 'html.parser'
+
 # 初始化rich控制台
 console = Console()
 
 # 全局状态字典，用于存储下载状态
-download_status = {}
+# 按状态分桶存放（桶的顺序即表格显示顺序），渲染时直接按桶拼接，不必每帧重新排序
+download_status = {status: {} for status in ["等待下载", "正在下载", "下载完成", "跳过，本地已存在"]}
+# 相册当前所在的状态桶
+album_status = {}
 # 全局计数器
 total_albums_count = 0
 processed_albums_count = 0
@@ -32,14 +44,91 @@ HEADERS = {
     'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
 }
 
+# 预编译的正则表达式
+TAG_ID_RE = re.compile(r'/b/(\d+)/?')
+PAGE_NUM_RE = re.compile(r'_([0-9]+)\.html')
+DOWNLOAD_TEXT_RE = re.compile(r'点击打包下载本套图|µã»÷´ò°üÏÂÔØ±¾Ì×Í¼')
+UNSAFE_CHARS_RE = re.compile(r'[\\/:*?"<>|]')
+
+# 各类页面只解析用得到的部分，跳过其余节点
+TAGS_ONLY = SoupStrainer('ul')
+LISTING_ONLY = SoupStrainer('div', class_=['m-list', 'page'])
+DOWNLOAD_ONLY = SoupStrainer('div', class_='Title111')
+
+# 每个主机的请求限速：每秒补充的令牌数和允许的突发请求数
+HOST_RATE = 0.5
+HOST_BURST = 2
+
 session = requests.Session()
-session.mount('http://', requests.adapters.HTTPAdapter(pool_connections=20, pool_maxsize=20))
-session.mount('https://', requests.adapters.HTTPAdapter(pool_connections=20, pool_maxsize=20))
+# 429/5xx由urllib3按退避时间自动重试（遵守Retry-After），重试用完后返回最后一次响应交给调用方处理
+retry = Retry(
+    total=5,
+    backoff_factor=1,
+    status_forcelist=[429, 500, 502, 503, 504],
+    allowed_methods=["GET"],
+    respect_retry_after_header=True,
+    raise_on_status=False
+)
+# http和https共用同一个适配器和连接池
+adapter = requests.adapters.HTTPAdapter(pool_connections=20, pool_maxsize=50, max_retries=retry)
+session.mount('http://', adapter)
+session.mount('https://', adapter)
+
+class TokenBucket:
+    """令牌桶限速器，按固定速率补充令牌，令牌不足时等待"""
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+    
+    def acquire(self):
+        """获取一个令牌，必要时阻塞到令牌可用"""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.last) * self.rate)
+            self.last = now
+            # 先预支令牌，令牌为负时按欠额计算等待时间，保证并发线程依次排队
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        if wait > 0:
+            time.sleep(wait)
+    
+    def penalize(self, delay):
+        """服务器要求放慢时，把之后的请求整体推迟delay秒"""
+        with self.lock:
+            # 先把令牌补到当前时刻，否则下次获取时会把请求本身耗费的时间算作补充，抵消掉惩罚
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.last) * self.rate)
+            self.last = now
+            self.tokens = min(self.tokens, 0) - delay * self.rate
+
+host_buckets = {}
+host_buckets_lock = threading.Lock()
+
+def fetch(url, **kwargs):
+    """按主机限速后发送GET请求，返回429/503时按Retry-After推迟该主机之后的请求"""
+    host = urlparse(url).netloc
+    with host_buckets_lock:
+        bucket = host_buckets.get(host)
+        if bucket is None:
+            bucket = host_buckets[host] = TokenBucket(HOST_RATE, HOST_BURST)
+    bucket.acquire()
+    response = session.get(url, headers=HEADERS, **kwargs)
+    if response.status_code in (429, 503):
+        retry_after = response.headers.get('Retry-After', '')
+        bucket.penalize(int(retry_after) if retry_after.isdigit() else 10)
+    return response
 
 def update_download_status(album_name, status, progress=0, tag_name="", speed=0):
     """更新下载状态"""
     global download_status
-    download_status[album_name] = {
+    old_status = album_status.get(album_name)
+    if old_status is not None and old_status != status:
+        download_status[old_status].pop(album_name, None)
+    album_status[album_name] = status
+    download_status.setdefault(status, {})[album_name] = {
         'tag': tag_name,
         'status': status,
         'progress': progress,
@@ -68,11 +157,8 @@ def create_status_table():
     table.add_column("状态", width=20, style="blue")
     
     # 按照状态排序：等待下载 -> 正在下载 -> 下载完成 -> 跳过
-    status_order = {"等待下载": 0, "正在下载": 1, "下载完成": 2, "跳过，本地已存在": 3}
-    sorted_albums = sorted(
-        download_status.items(),
-        key=lambda x: (status_order.get(x[1]['status'], 4), x[0])
-    )
+    # 按状态桶顺序拼接，同一状态内保持加入顺序（先复制再遍历，避免下载线程同时修改）
+    sorted_albums = [item for bucket in list(download_status.values()) for item in list(bucket.items())]
     
     if sorted_albums:
         for album_name, status_info in sorted_albums:
@@ -123,12 +209,13 @@ def create_status_table():
     
     return table
 
-def get_soup(url):
-    """获取网页的BeautifulSoup对象"""
+def get_soup(url, parse_only=None):
+    """获取网页的BeautifulSoup对象，parse_only指定时只解析匹配的节点"""
     try:
-        response = session.get(url, headers=HEADERS, timeout=30)
-        response.encoding = 'gb2312'
-        return BeautifulSoup(response.text, 'html.parser')
+        response = fetch(url, timeout=30)
+        # 页面声明为gb2312但实际含有GBK字符，直接按超集gb18030解码原始字节
+        html = response.content.decode('gb18030', errors='replace')
+        return BeautifulSoup(html, HTML_PARSER, parse_only=parse_only)
     except Exception as e:
         console.print(f"[red]获取页面 {url} 失败: {e}[/red]")
         return None
@@ -137,7 +224,7 @@ def get_tags():
     """获取所有标签链接和名称"""
     tags = []
     url = 'https://www.ku1372.cc/b/tag/'
-    soup = get_soup(url)
+    soup = get_soup(url, TAGS_ONLY)
     if not soup:
         return tags
     
@@ -158,103 +245,93 @@ def get_tags():
                 })
     return tags
 
-def get_albums(tag_url):
-    """获取标签下的所有相册链接"""
+def parse_listing(soup, page):
+    """解析列表页，一次取出当前页的相册和是否还有下一页"""
     albums = []
+    list_div = soup.find('div', class_='m-list')
+    if list_div:
+        for li in list_div.find_all('li'):
+            a_tag = li.find('a')
+            if a_tag:
+                album_name = a_tag.get('title', '').strip()
+                if album_name:
+                    albums.append({
+                        'name': album_name,
+                        'url': a_tag.get('href')
+                    })
+    
+    # 检查是否有下一页
+    has_next = False
+    page_div = soup.find('div', class_='page')
+    if page_div:
+        page_links = page_div.find_all('a')
+        
+        # 1. 通过文本匹配查找下一页
+        for a in page_links:
+            a_text = a.text.strip()
+            if a_text in ['下一页', 'ÏÂÒ»Ò³', 'Next', 'next'] or '下一页' in a_text:
+                has_next = True
+                break
+        
+        # 2. 如果文本匹配失败，查找页码比当前页大1的list_链接（排除当前页链接）
+        if not has_next:
+            for a in page_links:
+                href = a.get('href', '')
+                if 'list_' in href and 'this-page' not in a.get('class', []):
+                    page_match = PAGE_NUM_RE.search(href)
+                    if page_match and int(page_match.group(1)) == page + 1:
+                        has_next = True
+                        break
+    
+    return albums, has_next
+
+def iter_albums(tag_url):
+    """逐页获取标签下的相册，每页生成一次 (页码, 相册列表)"""
+    # 分页URL只与tag_id有关，每个标签只提取一次，实际格式为list_{tag_id}_{page}.html
+    base_url = tag_url.rstrip('/')
+    tag_id_match = TAG_ID_RE.search(tag_url)
+    if tag_id_match:
+        page_url_tmpl = f"{base_url}/list_{tag_id_match.group(1)}_{{page}}.html"
+    else:
+        # 如果无法提取tag_id，使用之前的格式作为备选
+        page_url_tmpl = f"{base_url}/list_{{page}}.html"
+    
     page = 1
     
     while True:
+        console.print(f"[yellow]正在爬取第 {page} 页相册...[/yellow]")
+        
         # 构建页码URL
-        if page == 1:
-            url = tag_url
-        else:
-            # 提取tag_id，实际分页URL格式为list_{tag_id}_{page}.html
-            # 从tag_url中提取数字ID
-            import re
-            tag_id_match = re.search(r'/b/(\d+)/?', tag_url)
-            if tag_id_match:
-                tag_id = tag_id_match.group(1)
-                # 检查URL格式，构建正确的分页URL
-                if tag_url.endswith('/'):
-                    url = f"{tag_url}list_{tag_id}_{page}.html"
-                else:
-                    url = f"{tag_url}/list_{tag_id}_{page}.html"
-            else:
-                # 如果无法提取tag_id，使用之前的格式作为备选
-                if tag_url.endswith('/'):
-                    url = f"{tag_url}list_{page}.html"
-                else:
-                    url = f"{tag_url}/list_{page}.html"
+        url = tag_url if page == 1 else page_url_tmpl.format(page=page)
         
-        soup = get_soup(url)
+        soup = get_soup(url, LISTING_ONLY)
         if not soup:
+            console.print(f"[red]爬取第 {page} 页失败[/red]")
             break
         
-        # 查找相册列表
-        list_div = soup.find('div', class_='m-list')
-        if not list_div:
-            break
-        
-        # 查找所有相册链接
-        li_list = list_div.find_all('li')
-        if not li_list:
-            break
-        
-        for li in li_list:
-            a_tag = li.find('a')
-            if a_tag:
-                album_url = a_tag.get('href')
-                album_name = a_tag.get('title', '').strip()
-                albums.append({
-                    'name': album_name,
-                    'url': album_url
-                })
-        
-        # 检查是否有下一页
-        page_div = soup.find('div', class_='page')
-        if not page_div:
-            print(f"未找到分页控件，结束爬取 (第{page}页)")
+        # 一次解析出当前页的相册和下一页信息
+        page_albums, has_next = parse_listing(soup, page)
+        if not page_albums:
+            console.print(f"[red]第 {page} 页未找到相册[/red]")
             break
         
-        # 尝试多种方式查找下一页
-        next_page = None
+        console.print(f"[green]第 {page} 页找到 {len(page_albums)} 个相册[/green]")
+        yield page, page_albums
         
-        # 1. 通过文本匹配查找下一页
-        text_matches = page_div.find_all('a')
-        for a in text_matches:
-            a_text = a.text.strip()
-            if a_text in ['下一页', 'ÏÂÒ»Ò³', 'Next', 'next'] or '下一页' in a_text:
-                next_page = a
-                break
-        
-        # 2. 如果文本匹配失败，查找包含href且href中包含list的链接
-        if not next_page:
-            href_matches = page_div.find_all('a', href=re.compile(r'list_'))
-            for a in href_matches:
-                # 排除当前页链接
-                if 'this-page' not in a.get('class', []):
-                    # 尝试解析页码，找到比当前页大1的页码
-                    page_match = re.search(r'_([0-9]+)\.html', a.get('href', ''))
-                    if page_match:
-                        link_page = int(page_match.group(1))
-                        if link_page == page + 1:
-                            next_page = a
-                            break
-        
-        if not next_page:
-            print(f"未找到下一页链接，结束爬取 (第{page}页)")
+        if not has_next:
+            console.print(f"[yellow]第 {page} 页未找到下一页链接，结束该标签爬取[/yellow]")
             break
         
         page += 1
-        print(f"准备爬取下一页: 第{page}页")
-        # 增加页面爬取延迟
-        time.sleep(random.randint(4, 8))
-    
-    return albums
+        console.print(f"[cyan]准备爬取下一页: 第 {page} 页[/cyan]")
+
+def get_albums(tag_url):
+    """获取标签下的所有相册链接"""
+    return [album for _, page_albums in iter_albums(tag_url) for album in page_albums]
 
 def get_download_link(album_url):
     """获取相册的下载链接"""
-    soup = get_soup(album_url)
+    soup = get_soup(album_url, DOWNLOAD_ONLY)
     if not soup:
         return None
     
@@ -263,19 +340,29 @@ def get_download_link(album_url):
     if not title_div:
         return None
     
-    download_a = title_div.find('a', text=re.compile(r'点击打包下载本套图|µã»÷´ò°üÏÂÔØ±¾Ì×Í¼'))
+    download_a = title_div.find('a', text=DOWNLOAD_TEXT_RE)
     if download_a:
         return download_a.get('href')
     
     return None
 
-def extract_zip(zip_path, extract_dir, delete_after=False):
+def extract_zip(zip_path, extract_dir, delete_after=False, verify=False):
     """解压单个压缩包"""
     try:
+        extracted_paths = []
         with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-            zip_ref.extractall(extract_dir)
+            for info in zip_ref.infolist():
+                extracted_paths.append(zip_ref.extract(info, extract_dir))
         print(f"解压成功: {os.path.basename(zip_path)}")
         
+        # 解压后趁文件还在页缓存中立即校验图片，有损坏时保留原压缩包
+        if verify:
+            image_paths = [path for path in extracted_paths if path.lower().endswith(('.jpg', '.jpeg', '.png', '.gif'))]
+            bad_count = sum(1 for path in image_paths if not verify_image(path))
+            if bad_count:
+                print(f"校验发现 {bad_count} 张损坏图片，保留原压缩包: {os.path.basename(zip_path)}")
+                return False
+        
         if delete_after:
             os.remove(zip_path)
             print(f"删除原压缩包: {os.path.basename(zip_path)}")
@@ -285,6 +372,13 @@ def extract_zip(zip_path, extract_dir, delete_after=False):
         print(f"解压失败 {os.path.basename(zip_path)}: {e}")
         return False
 
+def extract_zips_in_dir(dir_path, delete_after=False, verify=False):
+    """依次解压目录下的所有压缩包"""
+    for file in os.listdir(dir_path):
+        if file.endswith('.zip'):
+            zip_path = os.path.join(dir_path, file)
+            extract_zip(zip_path, dir_path, delete_after, verify)
+
 def verify_image(image_path):
     """验证图像是否损坏"""
     try:
@@ -295,10 +389,25 @@ def verify_image(image_path):
         print(f"图像损坏: {image_path} - {e}")
         return False
 
+completed_lock = threading.Lock()
+
+def load_completed(path):
+    """读取已完成相册记录，每行一个相册URL"""
+    if not os.path.exists(path):
+        return set()
+    with open(path, 'r', encoding='utf-8') as f:
+        return {line.strip() for line in f if line.strip()}
+
+def record_completed(path, album_url):
+    """追加一条已完成相册记录，只写一行，不重写整个文件"""
+    with completed_lock:
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(album_url + '\n')
+
 def main():
     # 解析命令行参数
     parser = argparse.ArgumentParser(description='爬取ku1372网站相册')
-    parser.add_argument('--verify', action='store_true', help='启用已存在文件验证')
+    parser.add_argument('--verify', action='store_true', help='启用文件验证：检查已存在的压缩包，并在解压后用PIL逐张校验图片（解压会明显变慢）')
     parser.add_argument('--max-workers', type=int, default=2, help='最大下载线程数')
     args = parser.parse_args()
     
@@ -311,6 +420,10 @@ def main():
     # 创建保存目录
     os.makedirs(save_path, exist_ok=True)
     
+    # 读取已完成相册记录，压缩包解压并删除后重新运行也能直接跳过
+    completed_file = os.path.join(save_path, 'completed_albums.txt')
+    completed_urls = load_completed(completed_file)
+    
     # 询问解压选项（在下载开始之前）
     console.print("\n=== 解压选项设置 ===")
     extract_choice = input("全站下载完成后是否解压压缩包？(y/n，默认y): ").strip().lower()
@@ -332,27 +445,26 @@ def main():
     # 开始下载，使用Live显示动态表格和统计信息
     total_success = 0
     
-    # 创建Live上下文，一开始就显示统计信息和表格
-    with Live(None, refresh_per_second=2, console=console) as live:
-        # 定义内容渲染函数
-        def render_content():
-            """渲染统计信息和表格"""
-            from rich.console import Group
-            
-            # 获取统计信息和表格
-            table = create_status_table()
-            
-            # 使用Group来组合多个Renderable对象
-            group = Group(
-                get_stats_text(),
-                "",
-                table
-            )
-            
-            return group
+    # 定义内容渲染函数
+    def render_content():
+        """渲染统计信息和表格"""
+        from rich.console import Group
+        
+        # 获取统计信息和表格
+        table = create_status_table()
+        
+        # 使用Group来组合多个Renderable对象
+        group = Group(
+            get_stats_text(),
+            "",
+            table
+        )
         
-        # 初始化Live显示
-        live.update(render_content())
+        return group
+    
+    # 创建Live上下文，一开始就显示统计信息和表格
+    # 由Live自己的刷新线程每秒调用2次render_content重绘，下载线程只更新状态，不再各自触发渲染
+    with Live(get_renderable=render_content, refresh_per_second=2, console=console):
         # 遍历所有标签
         for tag_index, tag in enumerate(tags):
             tag_name = tag['name']
@@ -361,63 +473,11 @@ def main():
             # 初始化标签目录
             tag_dir = os.path.join(save_path, tag_name)
             os.makedirs(tag_dir, exist_ok=True)
+            # 一次读取整个标签目录，记下已有文件的大小，避免每个相册单独stat
+            existing_sizes = {entry.name: entry.stat().st_size for entry in os.scandir(tag_dir) if entry.is_file()}
             
-            # 分页爬取和下载
-            page = 1
-            has_more_pages = True
-            
-            while has_more_pages:
-                console.print(f"[yellow]正在爬取第 {page} 页相册...[/yellow]")
-                
-                # 构建页码URL
-                if page == 1:
-                    current_url = tag['url']
-                else:
-                    # 提取tag_id
-                    tag_id_match = re.search(r'/b/(\d+)/?', tag['url'])
-                    if tag_id_match:
-                        tag_id = tag_id_match.group(1)
-                        if tag['url'].endswith('/'):
-                            current_url = f"{tag['url']}list_{tag_id}_{page}.html"
-                        else:
-                            current_url = f"{tag['url']}/list_{tag_id}_{page}.html"
-                    else:
-                        console.print(f"[red]无法提取tag_id，跳过第 {page} 页[/red]")
-                        break
-                
-                # 爬取当前页相册
-                soup = get_soup(current_url)
-                if not soup:
-                    console.print(f"[red]爬取第 {page} 页失败[/red]")
-                    break
-                
-                # 查找相册列表
-                list_div = soup.find('div', class_='m-list')
-                if not list_div:
-                    console.print(f"[red]第 {page} 页未找到相册列表[/red]")
-                    break
-                
-                # 查找所有相册链接
-                li_list = list_div.find_all('li')
-                if not li_list:
-                    console.print(f"[red]第 {page} 页未找到相册[/red]")
-                    break
-                
-                console.print(f"[green]第 {page} 页找到 {len(li_list)} 个相册[/green]")
-                
-                # 提取当前页相册
-                current_page_albums = []
-                for li in li_list:
-                    a_tag = li.find('a')
-                    if a_tag:
-                        album_url = a_tag.get('href')
-                        album_name = a_tag.get('title', '').strip()
-                        if album_name:
-                            current_page_albums.append({
-                                'name': album_name,
-                                'url': album_url
-                            })
-                
+            # 逐页爬取和下载
+            for page, current_page_albums in iter_albums(tag['url']):
                 # 将当前页相册添加到表格中
                 for album in current_page_albums:
                     # 更新全局计数器
@@ -426,40 +486,42 @@ def main():
                     
                     # 初始化相册状态
                     update_download_status(album['name'], "等待下载", 0, tag_name)
-                    
-                    # 更新显示内容
-                    live.update(render_content())
                 
                 # 定义线程安全的成功计数器
                 thread_success_count = 0
+                success_lock = threading.Lock()
                 
-                # 定义一个内部函数来下载相册，这样可以访问render_content
+                # 定义一个内部函数来下载相册，这样可以访问当前页的计数器和标签目录信息
                 def download_album_wrapper(album, tag_dir, verify=False, tag_name=""):
                     nonlocal thread_success_count
                     album_name = album['name']
                     album_url = album['url']
                     
                     # 清理文件名
-                    safe_name = re.sub(r'[\\/:*?"<>|]', '_', album_name)
+                    safe_name = UNSAFE_CHARS_RE.sub('_', album_name)
                     save_path = os.path.join(tag_dir, f"{safe_name}.zip")
                     
+                    # 上次运行已下载完成的相册直接跳过（验证模式下仍检查本地文件）
+                    if album_url in completed_urls and not verify:
+                        update_download_status(album_name, "跳过，本地已存在", 100, tag_name)
+                        console.print(f"[green]跳过，已下载完成: {safe_name}[/green]")
+                        return True
+                    
                     # 如果文件已存在，根据verify参数决定是否验证
-                    if os.path.exists(save_path):
+                    existing_size = existing_sizes.get(f"{safe_name}.zip")
+                    if existing_size is not None:
                         if verify:
                             update_download_status(album_name, "正在下载", 0, tag_name)
-                            live.update(render_content())
                             console.print(f"[yellow]验证已存在文件: {safe_name}[/yellow]")
                             # 简单验证文件大小，大于1KB认为有效
-                            if os.path.getsize(save_path) > 1024:
+                            if existing_size > 1024:
                                 update_download_status(album_name, "跳过，本地已存在", 100, tag_name)
-                                live.update(render_content())
                                 return True
                             else:
                                 console.print(f"[orange]文件已存在但无效，重新下载: {safe_name}[/orange]")
                                 os.remove(save_path)
                         else:
                             update_download_status(album_name, "跳过，本地已存在", 100, tag_name)
-                            live.update(render_content())
                             console.print(f"[green]跳过，本地已存在: {safe_name}[/green]")
                             return True
                     
@@ -467,88 +529,102 @@ def main():
                     retry_count = 0
                     max_retries = 5
                     
+                    download_url = None
+                    
                     while retry_count < max_retries:
                         try:
-                            # 获取下载链接
-                            download_url = get_download_link(album_url)
+                            # 获取下载链接，重试时复用已取得的链接，不再重复请求详情页
+                            if not download_url:
+                                download_url = get_download_link(album_url)
                             if not download_url:
                                 update_download_status(album_name, "下载完成", 0, tag_name)
-                                live.update(render_content())
                                 console.print(f"[red]获取下载链接失败: {album_name}[/red]")
                                 return False
                             
-                            # 添加专辑详情页请求延迟
-                            delay = random.randint(2, 4)
-                            console.print(f"[blue]等待 {delay} 秒后下载: {album_name}[/blue]")
-                            time.sleep(delay)
-                            
                             update_download_status(album_name, "正在下载", 0, tag_name)
-                            live.update(render_content())
                             console.print(f"[green]正在下载: {album_name} (尝试 {retry_count+1}/{max_retries})[/green]")
                             
                             # 添加超时重试机制
-                            response = session.get(download_url, headers=HEADERS, stream=True, timeout=60)
+                            response = fetch(download_url, stream=True, timeout=60)
                             response.raise_for_status()  # 检查HTTP状态码
                             
                             total_size = int(response.headers.get('content-length', 0))
+                            
+                            # 响应头已表明是HTML错误页或内容过小（正常压缩包不会小于2KB），不必再下载内容（下面的首块检查作为兜底）
+                            content_type = response.headers.get('Content-Type', '').lower()
+                            if content_type.startswith('text/html') or 0 < total_size < 2048:
+                                response.close()
+                                update_download_status(album_name, "等待下载", 0, tag_name)
+                                console.print(f"[red]下载失败，返回HTML错误页或内容过小 ({total_size} bytes): {album_name}[/red]")
+                                # 链接可能已失效，下次重试重新获取
+                                download_url = None
+                                retry_count += 1
+                                # 重试前延迟
+                                time.sleep(random.randint(4, 8))
+                                continue
+                            
                             console.print(f"[cyan]文件大小: {total_size / 1024 / 1024:.2f} MB[/cyan]")
                             
                             downloaded_size = 0
-                            start_time = time.time()
-                            last_update_time = start_time
+                            start_time = time.monotonic()
+                            next_report_time = start_time + 1.0
+                            last_report_time = start_time
+                            last_report_size = 0
+                            header = b''
+                            is_html_page = False
                             
-                            with open(save_path, 'wb') as f:
-                                for chunk in response.iter_content(chunk_size=8192):
+                            # 1 MiB写缓冲，多个数据块合并成一次系统调用写入
+                            # 响应放在with中，提前break（HTML错误页）或读取中途出错时也会关闭，连接及时回到连接池
+                            with response, open(save_path, 'wb', buffering=1024 * 1024) as f:
+                                for chunk in response.iter_content(chunk_size=128 * 1024):
                                     if chunk:
+                                        # 收到第一个数据块时就判断是否为HTML错误页，是则立即停止下载
+                                        if not header:
+                                            header = chunk[:512]
+                                            is_html_page = b'<!DOCTYPE html>' in header or b'<html>' in header or b'<head>' in header
+                                            if is_html_page:
+                                                break
                                         f.write(chunk)
                                         downloaded_size += len(chunk)
                                         
-                                        # 计算下载速度和进度
-                                        current_time = time.time()
-                                        elapsed_time = current_time - start_time
-                                        
-                                        # 每秒更新一次状态和表格
-                                        if current_time - last_update_time >= 1.0 and total_size > 0:
+                                        # 每秒更新一次状态（表格由Live定时重绘）
+                                        current_time = time.monotonic()
+                                        if current_time >= next_report_time and total_size > 0:
                                             progress = (downloaded_size / total_size) * 100
                                             
-                                            # 计算下载速度（KB/s）
-                                            if elapsed_time > 0:
-                                                speed_kbps = (downloaded_size / elapsed_time) / 1024
-                                            else:
-                                                speed_kbps = 0
+                                            # 计算最近一次更新以来的下载速度（KB/s）
+                                            speed_kbps = (downloaded_size - last_report_size) / (current_time - last_report_time) / 1024
                                             
                                             update_download_status(album_name, "正在下载", progress, tag_name, speed_kbps)
-                                            # 更新表格
-                                            live.update(render_content())
-                                            last_update_time = current_time
+                                            last_report_time = current_time
+                                            last_report_size = downloaded_size
+                                            next_report_time = current_time + 1.0
                             
                             # 下载完成后更新最终状态
-                            final_time = time.time()
+                            final_time = time.monotonic()
                             total_elapsed = final_time - start_time
                             if total_elapsed > 0:
                                 avg_speed_kbps = (downloaded_size / total_elapsed) / 1024
                                 console.print(f"[cyan]平均下载速度: {avg_speed_kbps:.2f} KB/s[/cyan]")
                             
-                            # 验证下载内容是否为HTML错误页
-                            with open(save_path, 'rb') as f:
-                                content = f.read(512)  # 读取更多内容进行验证
-                                if b'<!DOCTYPE html>' in content or b'<html>' in content or b'<head>' in content:
-                                    update_download_status(album_name, "等待下载", 0, tag_name)
-                                    live.update(render_content())
-                                    console.print(f"[red]下载失败，返回HTML错误页: {album_name}[/red]")
-                                    os.remove(save_path)
-                                    retry_count += 1
-                                    # 重试前延迟
-                                    time.sleep(random.randint(4, 8))
-                                    continue
+                            # 下载内容为HTML错误页
+                            if is_html_page:
+                                update_download_status(album_name, "等待下载", 0, tag_name)
+                                console.print(f"[red]下载失败，返回HTML错误页: {album_name}[/red]")
+                                os.remove(save_path)
+                                # 链接可能已失效，下次重试重新获取
+                                download_url = None
+                                retry_count += 1
+                                # 重试前延迟
+                                time.sleep(random.randint(4, 8))
+                                continue
                             
-                            # 验证文件大小
-                            final_size = os.path.getsize(save_path)
+                            # 验证文件大小（写入的字节数即文件大小，无需再stat）
+                            final_size = downloaded_size
                             console.print(f"[cyan]实际下载大小: {final_size / 1024 / 1024:.2f} MB[/cyan]")
                             
                             if final_size < 1024:
                                 update_download_status(album_name, "等待下载", 0, tag_name)
-                                live.update(render_content())
                                 console.print(f"[red]下载失败，文件太小 ({final_size} bytes): {album_name}[/red]")
                                 os.remove(save_path)
                                 retry_count += 1
@@ -559,7 +635,6 @@ def main():
                             # 验证文件完整性（简单检查）
                             if total_size > 0 and abs(final_size - total_size) > 1024:
                                 update_download_status(album_name, "等待下载", 0, tag_name)
-                                live.update(render_content())
                                 console.print(f"[red]下载失败，文件大小不匹配 (预期: {total_size}, 实际: {final_size}): {album_name}[/red]")
                                 os.remove(save_path)
                                 retry_count += 1
@@ -567,14 +642,22 @@ def main():
                                 time.sleep(random.randint(4, 8))
                                 continue
                             
+                            existing_sizes[f"{safe_name}.zip"] = final_size
+                            record_completed(completed_file, album_url)
                             update_download_status(album_name, "下载完成", 100, tag_name)
-                            live.update(render_content())
                             console.print(f"[green]✓ 下载成功: {album_name}[/green]")
-                            thread_success_count += 1
+                            with success_lock:
+                                thread_success_count += 1
                             return True
+                        except requests.exceptions.HTTPError as e:
+                            if e.response is not None:
+                                e.response.close()
+                            # 可重试的状态码已由session的Retry退避重试过，其余状态码（如404）重试也没有意义
+                            update_download_status(album_name, "下载完成", 0, tag_name)
+                            console.print(f"[red]✗ 专辑 {album_name} 下载失败，服务器返回错误: {e}[/red]")
+                            return False
                         except requests.exceptions.RequestException as e:
                             update_download_status(album_name, "等待下载", 0, tag_name)
-                            live.update(render_content())
                             console.print(f"[red]网络请求失败 (尝试 {retry_count+1}/{max_retries}): {e}[/red]")
                             retry_count += 1
                             if os.path.exists(save_path):
@@ -583,7 +666,6 @@ def main():
                             time.sleep(random.randint(4, 8))
                         except Exception as e:
                             update_download_status(album_name, "等待下载", 0, tag_name)
-                            live.update(render_content())
                             console.print(f"[red]下载专辑 {album_name} 失败 (尝试 {retry_count+1}/{max_retries}): {e}[/red]")
                             retry_count += 1
                             if os.path.exists(save_path):
@@ -593,7 +675,6 @@ def main():
                     
                     # 5次重试失败后，继续执行
                     update_download_status(album_name, "下载完成", 0, tag_name)
-                    live.update(render_content())
                     console.print(f"[red]✗ 专辑 {album_name} 下载失败，已重试5次[/red]")
                     return False
                 
@@ -617,57 +698,22 @@ def main():
                         # 更新已处理计数器
                         global processed_albums_count
                         processed_albums_count += 1
-                        
-                        # 更新显示内容
-                        live.update(render_content())
                 
                 # 更新总成功数
                 total_success += thread_success_count
                 
-                # 页面下载完成后延迟
-                time.sleep(random.randint(2, 5))
-                
-                # 检查是否有下一页
-                page_div = soup.find('div', class_='page')
-                if not page_div:
-                    console.print(f"[yellow]第 {page} 页未找到分页控件，结束该标签爬取[/yellow]")
-                    has_more_pages = False
-                    break
-                
-                # 查找下一页链接
-                next_page = None
-                text_matches = page_div.find_all('a')
-                for a in text_matches:
-                    a_text = a.text.strip()
-                    if a_text in ['下一页', 'ÏÂÒ»Ò³', 'Next', 'next'] or '下一页' in a_text:
-                        next_page = a
-                        break
-                
-                if not next_page:
-                    console.print(f"[yellow]第 {page} 页未找到下一页链接，结束该标签爬取[/yellow]")
-                    has_more_pages = False
-                    break
-                
-                # 进入下一页
-                page += 1
-                console.print(f"[cyan]准备爬取下一页: 第 {page} 页[/cyan]")
-                
-                # 页面爬取间隔
-                time.sleep(random.randint(4, 8))
-            
+
             console.print(f"[bold magenta]=== 标签 {tag_index+1}/{len(tags)} 处理完成 ===[/bold magenta]")
     
     # 执行解压操作（如果用户选择了解压）
     if should_extract:
         console.print("\n[bold blue]=== 开始解压压缩包 ===[/bold blue]")
-        # 遍历所有标签目录
-        for tag in tags:
-            tag_dir = os.path.join(save_path, tag['name'])
-            if os.path.exists(tag_dir):
-                for file in os.listdir(tag_dir):
-                    if file.endswith('.zip'):
-                        zip_path = os.path.join(tag_dir, file)
-                        extract_zip(zip_path, tag_dir, delete_after)
+        # 按标签目录并行解压（zlib解压时释放GIL，线程即可用上多核）
+        # 同一目录内的压缩包仍依次解压，避免同名文件被多个线程同时写入
+        tag_dirs = [os.path.join(save_path, tag['name']) for tag in tags]
+        tag_dirs = [tag_dir for tag_dir in tag_dirs if os.path.exists(tag_dir)]
+        with ThreadPoolExecutor(max_workers=os.cpu_count() or 4) as executor:
+            list(executor.map(lambda tag_dir: extract_zips_in_dir(tag_dir, delete_after, args.verify), tag_dirs))
     
     # 总结数据
     console.print(f"\n[bold green]=== 下载完成 ===[/bold green]")
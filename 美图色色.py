@@ -1,80 +1,220 @@
 import os
+import queue
+import shutil
 import time
 import random
 import requests
 import argparse
 import logging
+import logging.handlers
+import atexit
+import threading
+from collections import deque
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
 from PIL import Image
 from io import BytesIO
+from urllib.parse import urljoin, urlparse
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+# 日志由后台线程统一输出，下载线程只把记录放进队列，不再争用输出流的锁
+_log_queue = queue.SimpleQueue()
+_log_handler = logging.StreamHandler()
+_log_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+_log_listener = logging.handlers.QueueListener(_log_queue, _log_handler)
+# QueueHandler只合并消息参数，时间和级别由后台线程的格式化器添加
+logging.basicConfig(level=logging.INFO, format='%(message)s', handlers=[logging.handlers.QueueHandler(_log_queue)])
+_log_listener.start()
+atexit.register(_log_listener.stop)
 logger = logging.getLogger(__name__)
 
+# 优先使用C实现的lxml解析器，未安装时回退到html.parser
+try:
+    import lxml
+    HTML_PARSER = 'lxml'
+except ImportError:
+    HTML_PARSER = 'html.parser'
+
+# 列表页只需要相册列表和翻页区域，相册页只需要图片容器，解析时跳过其余节点
+ALBUM_LIST_ONLY = SoupStrainer(class_=['videos-list-wrap', 'mo-paging'])
+BOOK_PAGES_ONLY = SoupStrainer(id='book-pages')
+
+# 相册名中不能用作目录名的字符
+UNSAFE_TITLE_CHARS = str.maketrans('', '', '<>"/\\|?*')
+
+ALBUM_WORKERS = 5  # 同时处理的相册数
+IMAGE_WORKERS = 20  # 每个相册的图片下载线程数
+READ_BUFFER_SIZE = 256 * 1024
+
+class HostRateLimiter:
+    # 滑动窗口限速：任意1秒内最多放行max_per_second个请求，未超限时立即返回，不做固定等待
+    def __init__(self, max_per_second):
+        self.max_per_second = max_per_second
+        self._times = deque()
+        self._cond = threading.Condition()
+    
+    def acquire(self):
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                while self._times and now - self._times[0] >= 1:
+                    self._times.popleft()
+                if len(self._times) < self.max_per_second:
+                    self._times.append(now)
+                    return
+                # 等到窗口内最早的请求满1秒
+                self._cond.wait(1 - (now - self._times[0]))
+
 class MeituSpider:
-    def __init__(self, save_path, verify=False, page_sleep=5, album_sleep=3):
+    def __init__(self, save_path, verify=False, page_sleep=5, album_sleep=3, host_rate=10, retry_mode="ask"):
         self.save_path = save_path
         self.verify = verify
+        self.retry_mode = retry_mode
         self.page_sleep = page_sleep
         self.album_sleep = album_sleep
+        self.host_rate = host_rate
+        self._limiters = {}
+        self._limiters_lock = threading.Lock()
         self.session = self._init_session()
         self.base_url = "https://xn--drdgbhrb-xx6n10qjm3s.tljkd-01.sbs"
+        # 拼接页面中的相对链接用，链接缺少开头的"/"时也能得到正确地址
+        self._base_with_slash = self.base_url.rstrip("/") + "/"
         self.user_agents = [
             "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
             "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/90.0.4430.212 Safari/537.36",
             "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/89.0.4389.114 Safari/537.36"
         ]
-        self.failed_images = []
-        self.failed_albums = []
+        self.failed_images = deque()
+        self.failed_albums = deque()
+        self._page_lock = threading.Lock()
+        self._next_page_time = 0
+        # 图片下载的读缓冲区复用池，数量不超过同时下载的线程数
+        self._buf_pool = queue.LifoQueue(maxsize=ALBUM_WORKERS * IMAGE_WORKERS)
+        # 已下载图片的URL -> 保存路径（相对save_path），不同相册重复上传的同一张图片只下载一次
+        self.url_cache_file = os.path.join(save_path, "downloaded_images.txt")
+        self.url_cache = {}
+        self._url_cache_lock = threading.Lock()
     
     def _init_session(self):
         session = requests.Session()
         retry = Retry(
             total=3,
+            # 连接和读取错误交给_get_response按指数退避重试，避免两层重试次数相乘
+            connect=0,
+            read=0,
             backoff_factor=1,
-            status_forcelist=[429, 500, 502, 503, 504]
+            status_forcelist=[429, 500, 502, 503, 504],
+            respect_retry_after_header=True
+        )
+        # 每个主机的连接池够所有下载线程和相册线程同时使用；满了则排队等待空闲连接，而不是新建连接用完即弃
+        adapter = HTTPAdapter(
+            max_retries=retry,
+            pool_connections=32,
+            pool_maxsize=ALBUM_WORKERS * (IMAGE_WORKERS + 1),
+            pool_block=True
         )
-        adapter = HTTPAdapter(max_retries=retry, pool_connections=100, pool_maxsize=100)
         session.mount("http://", adapter)
         session.mount("https://", adapter)
         return session
     
+    def _load_url_cache(self):
+        if not os.path.exists(self.url_cache_file):
+            return {}
+        cache = {}
+        with open(self.url_cache_file, "r", encoding="utf-8") as f:
+            for line in f:
+                img_url, sep, rel_path = line.rstrip("\n").partition("\t")
+                if sep:
+                    cache[img_url] = rel_path
+        return cache
+    
+    def _record_url(self, img_url, save_path):
+        rel_path = os.path.relpath(save_path, self.save_path)
+        with self._url_cache_lock:
+            self.url_cache[img_url] = rel_path
+            with open(self.url_cache_file, "a", encoding="utf-8") as f:
+                f.write(f"{img_url}\t{rel_path}\n")
+    
+    def _reuse_cached_image(self, img_url, save_path):
+        rel_path = self.url_cache.get(img_url)
+        if not rel_path:
+            return False
+        cached_path = os.path.join(self.save_path, rel_path)
+        if os.path.abspath(cached_path) == os.path.abspath(save_path) or not os.path.exists(cached_path):
+            return False
+        try:
+            # 优先建立硬链接，不占额外空间；文件系统不支持时复制一份
+            try:
+                os.link(cached_path, save_path)
+            except OSError:
+                shutil.copyfile(cached_path, save_path)
+        except OSError as e:
+            logger.warning(f"[下载] 复用已下载图片失败，重新下载: {cached_path}: {e}")
+            return False
+        logger.debug(f"[下载] 图片已在其他相册下载过，直接复用: {cached_path}")
+        return True
+    
     def _get_random_user_agent(self):
         return random.choice(self.user_agents)
     
-    def _get_response(self, url, retries=5):
+    def _acquire_host(self, url):
+        if self.host_rate <= 0:
+            return
+        host = urlparse(url).netloc
+        with self._limiters_lock:
+            limiter = self._limiters.get(host)
+            if limiter is None:
+                limiter = self._limiters[host] = HostRateLimiter(self.host_rate)
+        limiter.acquire()
+    
+    def _get_response(self, url, retries=5, stream=False):
         headers = {
             "User-Agent": self._get_random_user_agent(),
             "Referer": self.base_url
         }
         
         for i in range(retries):
+            # 同一主机的请求数超过上限时才等待
+            self._acquire_host(url)
             start_time = time.time()
             try:
                 logger.debug(f"[请求] 开始请求: {url}")
                 logger.debug(f"[请求] 请求头: {headers}")
-                response = self.session.get(url, headers=headers, timeout=30)
+                response = self.session.get(url, headers=headers, timeout=30, stream=stream)
                 response.raise_for_status()
                 request_time = time.time() - start_time
-                logger.info(f"[请求] {url} 成功，耗时 {request_time:.2f}秒")
-                
-                delay = random.uniform(4, 8)
-                logger.info(f"[请求] {url} 成功，{delay:.2f}秒后继续")
-                time.sleep(delay)
+                logger.debug(f"[请求] {url} 成功，耗时 {request_time:.2f}秒")
                 return response
+            except (requests.exceptions.HTTPError, requests.exceptions.RetryError) as e:
+                # 429/5xx已由session的Retry按退避重试过，其余状态码（如404）重试也没有意义
+                # 出错的响应要关闭，流式请求的连接才会还回连接池；连接池满时会阻塞等待，漏还的连接会让后续请求一直卡住
+                if e.response is not None:
+                    e.response.close()
+                request_time = time.time() - start_time
+                logger.error(f"[请求] {url} 失败，服务器返回错误，耗时 {request_time:.2f}秒: {e}")
+                return None
             except Exception as e:
                 request_time = time.time() - start_time
                 if i < retries - 1:
-                    delay = random.uniform(4, 8)
+                    # 指数退避加随机抖动：偶发错误很快重试，持续失败时逐渐拉长间隔
+                    delay = min(30, 0.5 * 2 ** i) * random.uniform(0.5, 1.5)
                     logger.warning(f"[请求] {url} 失败，{i+1}/{retries} 重试，耗时 {request_time:.2f}秒，{delay:.2f}秒后重试: {e}")
                     time.sleep(delay)
                 else:
                     logger.error(f"[请求] {url} 失败，{retries} 次重试后仍失败，总耗时 {request_time:.2f}秒: {e}")
                     return None
     
+    def _get_page(self, url):
+        # 详情页请求之间至少间隔album_sleep秒，图片请求不受限制，由网络本身决定速度
+        with self._page_lock:
+            wait = self._next_page_time - time.monotonic()
+            if wait > 0:
+                logger.debug(f"[请求] 详情页请求限速，等待 {wait:.2f}秒")
+                time.sleep(wait)
+            self._next_page_time = time.monotonic() + self.album_sleep
+        return self._get_response(url)
+    
     def _parse_albums(self, url):
         response = self._get_response(url)
         
@@ -84,7 +224,7 @@ class MeituSpider:
         
         start_parse_time = time.time()
         try:
-            soup = BeautifulSoup(response.text, "html.parser")
+            soup = BeautifulSoup(response.content, HTML_PARSER, parse_only=ALBUM_LIST_ONLY)
             logger.info(f"[解析] 开始解析相册列表: {url}")
             
             albums = []
@@ -96,7 +236,7 @@ class MeituSpider:
                     album_url = album.get("href")
                     album_title = album.select_one(".video-desc-content").text.strip()
                     if album_url and album_title:
-                        full_url = f"{self.base_url}{album_url}"
+                        full_url = urljoin(self._base_with_slash, album_url)
                         albums.append((album_title, full_url))
                         logger.debug(f"[解析] 解析相册 {i+1}/{len(album_elements)}: {album_title} - {full_url}")
                     else:
@@ -107,7 +247,7 @@ class MeituSpider:
             next_page = None
             next_page_element = soup.select_one(".mo-paging .paging-item--next")
             if next_page_element and next_page_element.get("href"):
-                next_page = f"{self.base_url}{next_page_element.get('href')}"
+                next_page = urljoin(self._base_with_slash, next_page_element.get("href"))
                 logger.info(f"[解析] 找到下一页链接: {next_page}")
             else:
                 logger.info(f"[解析] 未找到下一页链接")
@@ -124,8 +264,12 @@ class MeituSpider:
         start_parse_time = time.time()
         logger.info(f"[解析] 开始解析相册图片: {album_url}")
         
-        response = self._get_response(album_url)
-        soup = BeautifulSoup(response.text, "html.parser")
+        response = self._get_page(album_url)
+        if response is None:
+            logger.error(f"[解析] 请求失败，无法解析相册: {album_url}")
+            return []
+        
+        soup = BeautifulSoup(response.content, HTML_PARSER, parse_only=BOOK_PAGES_ONLY)
         
         book_pages = soup.select_one("#book-pages")
         if not book_pages:
@@ -137,13 +281,8 @@ class MeituSpider:
             logger.error(f"[解析] 未找到相册图片URL: {album_url}")
             return []
         
-        images = []
-        for img_url in screenshots.split("#$"):
-            img_url = img_url.strip()
-            if img_url:
-                if img_url.startswith('$'):
-                    img_url = img_url[1:]
-                images.append(img_url)
+        # 图片地址以"#$"分隔，地址前可能还带有"$"
+        images = [img_url.lstrip('$') for img_url in map(str.strip, screenshots.split("#$")) if img_url]
         parse_time = time.time() - start_parse_time
         logger.info(f"[解析] 从相册 {album_url} 中提取到 {len(images)} 张图片，耗时 {parse_time:.2f}秒")
         
@@ -152,7 +291,10 @@ class MeituSpider:
         
         return images
     
-    def _validate_image(self, image_path):
+    def _validate_image(self, image_path, head, tail):
+        # JPEG只检查下载时记下的开头SOI和结尾EOI标记（EOI后可能还有少量填充字节），不必重新读文件用PIL解码
+        if head == b"\xff\xd8":
+            return b"\xff\xd9" in tail
         try:
             with Image.open(image_path) as img:
                 img.verify()
@@ -160,15 +302,24 @@ class MeituSpider:
         except Exception:
             return False
     
-    def _download_image(self, img_url, save_path):
-        if os.path.exists(save_path):
-            logger.info(f"[下载] 图片已存在，跳过: {save_path}")
+    def _download_image(self, img_url, save_path, existing=None):
+        # existing是调用方预先列出的相册目录文件名集合，有则不必逐张图片stat
+        if existing is not None:
+            is_present = os.path.basename(save_path) in existing
+        else:
+            is_present = os.path.exists(save_path)
+        if is_present:
+            logger.debug(f"[下载] 图片已存在，跳过: {save_path}")
+            return True
+        
+        if self._reuse_cached_image(img_url, save_path):
             return True
         
         start_download_time = time.time()
-        logger.info(f"[下载] 开始下载: {img_url}")
+        logger.debug(f"[下载] 开始下载: {img_url}")
         
-        response = self._get_response(img_url)
+        # 流式下载，图片内容边读边写入文件，不在内存中整体缓存
+        response = self._get_response(img_url, stream=True)
         
         if response is None:
             logger.error(f"[下载] 请求失败，添加到失败列表: {img_url}")
@@ -178,41 +329,59 @@ class MeituSpider:
         content_type = response.headers.get("Content-Type", "")
         if not content_type.startswith("image/"):
             logger.error(f"[下载] 下载的不是图片，可能是错误页: {img_url}")
+            response.close()
             self.failed_images.append((img_url, save_path))
             return False
         
-        file_size = len(response.content)
-        logger.info(f"[下载] 图片大小: {file_size} 字节，类型: {content_type}")
-        
-        save_dir = os.path.dirname(save_path)
-        os.makedirs(save_dir, exist_ok=True)
-        logger.info(f"[下载] 确保保存目录存在: {save_dir}")
-        
         temp_path = f"{save_path}.tmp"
-        logger.info(f"[下载] 正在写入文件: {temp_path}")
+        logger.debug(f"[下载] 正在写入文件: {temp_path}")
         
+        try:
+            buf = self._buf_pool.get_nowait()
+        except queue.Empty:
+            buf = bytearray(READ_BUFFER_SIZE)
+        view = memoryview(buf)
+        head = b""
+        tail = b""
         try:
             start_write_time = time.time()
-            with open(temp_path, "wb") as f:
-                f.write(response.content)
+            with response, open(temp_path, "wb") as f:
+                response.raw.decode_content = True
+                while True:
+                    n = response.raw.readinto(view)
+                    if not n:
+                        break
+                    f.write(view[:n])
+                    if self.verify:
+                        # 边写边记下文件开头2字节和结尾32字节，供校验使用
+                        if not head:
+                            head = bytes(view[:2])
+                        tail = (tail + bytes(view[max(n - 32, 0):n]))[-32:]
+                file_size = f.tell()
             write_time = time.time() - start_write_time
-            logger.info(f"[下载] 文件写入完成，耗时 {write_time:.2f}秒")
+            logger.debug(f"[下载] 文件写入完成，图片大小: {file_size} 字节，类型: {content_type}，耗时 {write_time:.2f}秒")
         except Exception as e:
             logger.error(f"[下载] 文件写入失败: {e}")
             self.failed_images.append((img_url, save_path))
             return False
+        finally:
+            view.release()
+            try:
+                self._buf_pool.put_nowait(buf)
+            except queue.Full:
+                pass
         
         if self.verify:
             start_verify_time = time.time()
-            logger.info(f"[下载] 正在验证文件: {temp_path}")
+            logger.debug(f"[下载] 正在验证文件: {temp_path}")
             try:
-                if not self._validate_image(temp_path):
+                if not self._validate_image(temp_path, head, tail):
                     logger.error(f"[下载] 下载的图片损坏: {img_url}")
                     os.remove(temp_path)
                     self.failed_images.append((img_url, save_path))
                     return False
                 verify_time = time.time() - start_verify_time
-                logger.info(f"[下载] 文件验证完成，耗时 {verify_time:.2f}秒")
+                logger.debug(f"[下载] 文件验证完成，耗时 {verify_time:.2f}秒")
             except Exception as e:
                 logger.error(f"[下载] 文件验证失败: {e}")
                 os.remove(temp_path)
@@ -220,9 +389,10 @@ class MeituSpider:
                 return False
         
         try:
-            os.rename(temp_path, save_path)
+            os.replace(temp_path, save_path)
+            self._record_url(img_url, save_path)
             total_time = time.time() - start_download_time
-            logger.info(f"[下载] 下载完成: {save_path}，总耗时 {total_time:.2f}秒")
+            logger.debug(f"[下载] 下载完成: {save_path}，总耗时 {total_time:.2f}秒")
             return True
         except Exception as e:
             logger.error(f"[下载] 文件重命名失败: {e}")
@@ -232,31 +402,34 @@ class MeituSpider:
     
     def _download_album(self, album_info, total_albums, album_index):
         album_title, album_url = album_info
+        # 边翻列表页边下载时相册总数还未知，只显示序号
+        label = f"[专辑 {album_index+1}/{total_albums}]" if total_albums else f"[专辑 {album_index+1}]"
         start_album_time = time.time()
-        logger.info(f"[专辑 {album_index+1}/{total_albums}] 开始处理相册: {album_title}")
+        logger.info(f"{label} 开始处理相册: {album_title}")
         
-        safe_title = "".join([c for c in album_title if c not in '<>"/\\|?*'])[:50]
+        safe_title = album_title.translate(UNSAFE_TITLE_CHARS)[:50]
         album_dir = os.path.join(self.save_path, safe_title)
         os.makedirs(album_dir, exist_ok=True)
-        logger.info(f"[专辑 {album_index+1}/{total_albums}] 相册目录: {album_dir}")
+        existing = set(os.listdir(album_dir))
+        logger.info(f"{label} 相册目录: {album_dir}")
         
         images = self._parse_album_images(album_url)
         if not images:
-            logger.error(f"[专辑 {album_index+1}/{total_albums}] 未解析到图片: {album_url}")
+            logger.error(f"{label} 未解析到图片: {album_url}")
             self.failed_albums.append(album_info)
             return False
         
-        logger.info(f"[专辑 {album_index+1}/{total_albums}] 开始下载 {len(images)} 张图片")
+        logger.info(f"{label} 开始下载 {len(images)} 张图片")
         
         start_image_time = time.time()
         image_failures = []
         
-        with ThreadPoolExecutor(max_workers=20) as executor:
+        with ThreadPoolExecutor(max_workers=IMAGE_WORKERS) as executor:
             futures = []
             for img_index, img_url in enumerate(images):
                 img_name = f"{img_index+1:03d}.jpg"
                 img_path = os.path.join(album_dir, img_name)
-                futures.append(executor.submit(self._download_image, img_url, img_path))
+                futures.append(executor.submit(self._download_image, img_url, img_path, existing))
             
             for future in as_completed(futures):
                 try:
@@ -264,13 +437,13 @@ class MeituSpider:
                     if not result:
                         image_failures.append(result)
                 except Exception as e:
-                    logger.error(f"[专辑 {album_index+1}/{total_albums}] 下载图片时发生异常: {e}")
+                    logger.error(f"{label} 下载图片时发生异常: {e}")
                     image_failures.append(None)
         
         image_time = time.time() - start_image_time
         album_time = time.time() - start_album_time
-        logger.info(f"[专辑 {album_index+1}/{total_albums}] 相册处理完成，共下载 {len(images) - len(image_failures)} 张图片，耗时 {album_time:.2f}秒")
-        logger.info(f"[专辑 {album_index+1}/{total_albums}] 其中图片下载耗时 {image_time:.2f}秒")
+        logger.info(f"{label} 相册处理完成，共下载 {len(images) - len(image_failures)} 张图片，耗时 {album_time:.2f}秒")
+        logger.info(f"{label} 其中图片下载耗时 {image_time:.2f}秒")
         
         return True
     
@@ -278,27 +451,32 @@ class MeituSpider:
         if not self.failed_images:
             return
         
-        logger.info(f"[主程序] 开始重试 {len(self.failed_images)} 张失败的图片")
+        # 取出当前失败项再重试，重试中再次失败的会重新加入队列，不会在本轮被反复重试
+        retry_images = list(self.failed_images)
+        self.failed_images.clear()
+        logger.info(f"[主程序] 开始重试 {len(retry_images)} 张失败的图片")
         success_count = 0
         
-        for img_url, save_path in self.failed_images:
+        for img_url, save_path in retry_images:
             if self._download_image(img_url, save_path):
                 success_count += 1
         
-        logger.info(f"[主程序] 图片重试完成，成功 {success_count}/{len(self.failed_images)} 张")
+        logger.info(f"[主程序] 图片重试完成，成功 {success_count}/{len(retry_images)} 张")
     
     def _retry_failed_albums(self):
         if not self.failed_albums:
             return
         
-        logger.info(f"[主程序] 开始重试 {len(self.failed_albums)} 个失败的相册")
-        retry_count = 0
+        retry_albums = list(self.failed_albums)
+        self.failed_albums.clear()
+        logger.info(f"[主程序] 开始重试 {len(retry_albums)} 个失败的相册")
+        success_count = 0
         
-        for album_info in self.failed_albums:
-            if self._download_album(album_info, len(self.failed_albums), retry_count):
-                retry_count += 1
+        for album_index, album_info in enumerate(retry_albums):
+            if self._download_album(album_info, len(retry_albums), album_index):
+                success_count += 1
         
-        logger.info(f"[主程序] 相册重试完成，成功 {retry_count}/{len(self.failed_albums)} 个")
+        logger.info(f"[主程序] 相册重试完成，成功 {success_count}/{len(retry_albums)} 个")
     
     def run(self):
         start_total_time = time.time()
@@ -307,11 +485,15 @@ class MeituSpider:
         logger.info(f"[主程序] 验证选项: {self.verify}")
         logger.info(f"[主程序] 列表页延迟: {self.page_sleep}秒")
         logger.info(f"[主程序] 专辑页延迟: {self.album_sleep}秒")
+        logger.info(f"[主程序] 单个主机请求上限: {self.host_rate}次/秒")
         
         logger.info(f"[主程序] 正在创建保存目录: {self.save_path}")
         os.makedirs(self.save_path, exist_ok=True)
         logger.info(f"[主程序] 保存目录创建完成")
         
+        self.url_cache = self._load_url_cache()
+        logger.info(f"[主程序] 已下载图片记录: {len(self.url_cache)} 条")
+        
         all_albums = []
         current_url = "https://xn--drdgbhrb-xx6n10qjm3s.tljkd-01.sbs/t/13/"
         page = 1
@@ -319,63 +501,64 @@ class MeituSpider:
         processed_urls = set()
         
         start_list_time = time.time()
-        logger.info(f"[主程序] 开始爬取相册列表")
-        
-        while current_url and current_url not in processed_urls:
-            processed_urls.add(current_url)
-            logger.info(f"[主程序] 正在爬取第 {page} 页相册列表: {current_url}")
-            albums, next_page = self._parse_albums(current_url)
-            all_albums.extend(albums)
-            logger.info(f"[主程序] 第 {page} 页解析到 {len(albums)} 个相册")
-            
-            for i, (album_title, album_url) in enumerate(albums):
-                logger.info(f"[主程序]   发现相册 {i+1}: {album_title} - {album_url}")
-            
-            total_pages += 1
-            
-            if next_page and next_page not in processed_urls:
-                current_url = next_page
-                page += 1
-                logger.info(f"[主程序] 列表页爬取延迟 {self.page_sleep}秒")
-                time.sleep(self.page_sleep)
-            else:
-                if next_page and next_page in processed_urls:
-                    logger.warning(f"[主程序] 发现重复的下一页链接，停止翻页: {next_page}")
-                current_url = None
-        
-        list_time = time.time() - start_list_time
-        total_albums = len(all_albums)
-        logger.info(f"[主程序] 相册列表爬取完成，共爬取 {total_pages} 页，解析到 {total_albums} 个相册，耗时 {list_time:.2f}秒")
-        
-        start_download_time = time.time()
+        start_download_time = start_list_time
         failed_albums = []
-        logger.info(f"[主程序] 开始下载相册，最多同时处理5个相册")
+        logger.info(f"[主程序] 开始爬取相册列表，每解析完一页立即下载该页相册，最多同时处理{ALBUM_WORKERS}个相册")
         
-        with ThreadPoolExecutor(max_workers=5) as executor:
-            logger.info(f"[主程序] 线程池创建完成，最大工作线程数: 5")
-            futures = []
+        # 列表翻页与相册下载流水线进行：翻页延迟期间下载线程继续工作，不必等全部列表页爬完
+        with ThreadPoolExecutor(max_workers=ALBUM_WORKERS) as executor:
+            future_to_album = {}
             
-            start_submit_time = time.time()
-            for album_index, album_info in enumerate(all_albums):
-                futures.append(executor.submit(self._download_album, album_info, total_albums, album_index))
-            submit_time = time.time() - start_submit_time
-            logger.info(f"[主程序] 所有任务提交完成，共 {len(futures)} 个任务，耗时 {submit_time:.2f}秒")
+            while current_url and current_url not in processed_urls:
+                processed_urls.add(current_url)
+                logger.info(f"[主程序] 正在爬取第 {page} 页相册列表: {current_url}")
+                albums, next_page = self._parse_albums(current_url)
+                logger.info(f"[主程序] 第 {page} 页解析到 {len(albums)} 个相册")
+                
+                # 逐个相册的明细只在调试级别输出，默认级别下连循环都跳过
+                if logger.isEnabledFor(logging.DEBUG):
+                    for i, (album_title, album_url) in enumerate(albums):
+                        logger.debug(f"[主程序]   发现相册 {i+1}: {album_title} - {album_url}")
+                
+                for album_info in albums:
+                    future_to_album[executor.submit(self._download_album, album_info, None, len(all_albums))] = album_info
+                    all_albums.append(album_info)
+                
+                total_pages += 1
+                
+                if next_page and next_page not in processed_urls:
+                    current_url = next_page
+                    page += 1
+                    logger.info(f"[主程序] 列表页爬取延迟 {self.page_sleep}秒")
+                    time.sleep(self.page_sleep)
+                else:
+                    if next_page and next_page in processed_urls:
+                        logger.warning(f"[主程序] 发现重复的下一页链接，停止翻页: {next_page}")
+                    current_url = None
+            
+            list_time = time.time() - start_list_time
+            total_albums = len(all_albums)
+            logger.info(f"[主程序] 相册列表爬取完成，共爬取 {total_pages} 页，解析到 {total_albums} 个相册，耗时 {list_time:.2f}秒")
             
             logger.info(f"[主程序] 开始处理任务结果")
-            for future in as_completed(futures):
+            for future in as_completed(future_to_album):
+                album_info = future_to_album[future]
                 try:
-                    result = future.result()
-                    if result is not None and not result:
-                        failed_albums.append(result)
+                    if not future.result():
+                        failed_albums.append(album_info)
                 except Exception as e:
                     logger.error(f"[主程序] 处理相册失败: {e}")
+                    failed_albums.append(album_info)
         
         if failed_albums:
             logger.info(f"[主程序] 共有 {len(failed_albums)} 个相册下载失败，开始重试")
+            # 失败的相册已由_download_album记入self.failed_albums，重试前先移出，重试仍失败时会重新记入
+            retry_set = set(failed_albums)
+            self.failed_albums = deque(album_info for album_info in self.failed_albums if album_info not in retry_set)
             retry_futures = []
             with ThreadPoolExecutor(max_workers=3) as executor:
-                for album_info in failed_albums:
-                    retry_futures.append(executor.submit(self._download_album, album_info, len(failed_albums), failed_albums.index(album_info)))
+                for album_index, album_info in enumerate(failed_albums):
+                    retry_futures.append(executor.submit(self._download_album, album_info, len(failed_albums), album_index))
             
             for future in as_completed(retry_futures):
                 try:
@@ -393,8 +576,14 @@ class MeituSpider:
         if total_failed > 0:
             logger.info(f"[主程序] 共有 {len(self.failed_albums)} 个相册和 {len(self.failed_images)} 张图片下载失败")
             
-            retry_input = input("是否重试因失败跳过的图集？(y/N): ").strip().lower()
-            if retry_input in ['y', '']:
+            # 只有ask模式才询问，yes/no模式直接按参数处理，无人值守运行时不会卡在输入上
+            if self.retry_mode == "ask":
+                retry_input = input("是否重试因失败跳过的图集？(y/N): ").strip().lower()
+                should_retry = retry_input in ['y', '']
+            else:
+                should_retry = self.retry_mode == "yes"
+            
+            if should_retry:
                 logger.info("[主程序] 开始重试失败的图集")
                 
                 if self.failed_albums:
@@ -413,7 +602,9 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="美图色色相册爬虫")
     parser.add_argument("--page-sleep", type=float, default=5, help="列表页爬取延迟")
     parser.add_argument("--album-sleep", type=float, default=3, help="专辑详情页请求延迟")
+    parser.add_argument("--host-rate", type=float, default=10, help="单个主机每秒最多请求数，0为不限制")
     parser.add_argument("--no-verify", action="store_true", help="不验证文件，仅下载")
+    parser.add_argument("--retry-failed", choices=["yes", "no", "ask"], default="ask", help="结束后是否重试失败项，ask为运行结束时询问")
     parser.add_argument("--test", action="store_true", help="测试模式，使用默认路径无需交互")
     args = parser.parse_args()
     
@@ -430,7 +621,9 @@ if __name__ == "__main__":
         save_path=save_path,
         verify=verify,
         page_sleep=args.page_sleep,
-        album_sleep=args.album_sleep
+        album_sleep=args.album_sleep,
+        host_rate=args.host_rate,
+        retry_mode=args.retry_failed
     )
     
     spider.run()
\ No newline at end of file
@@ -1,5 +1,5 @@
 import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
 import concurrent.futures
 from PIL import Image
 import io
@@ -7,20 +7,47 @@ import os
 import time
 import random
 import argparse
+import atexit
+import json
 import logging
+import logging.handlers
 import shutil
 import re
 import sys
+import threading
+from urllib.parse import urlparse
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 
+# 优先使用C实现的lxml解析器，未安装时回退到html.parser
+try:
+    import lxml
+    HTML_PARSER = 'lxml'
+except ImportError:
+    HTML_PARSER = 'html.parser'
+
+# 相册页只需要<img>标签，解析时跳过其余节点
+IMG_ONLY = SoupStrainer('img')
+
+# 需要下载的图片链接（jpg, jpeg, png, gif，允许带查询参数），分组1为保存用的文件名
+IMAGE_URL_RE = re.compile(r'([^/?#]+\.(?:jpe?g|png|gif))(?:\?|$)', re.IGNORECASE)
+
+# 每个主机的请求限速：每秒补充的令牌数和允许的突发请求数
+HOST_RATE = 2.0
+HOST_BURST = 4
+
+# 已完成相册快照：每完成多少个相册写一次磁盘
+COMPLETED_SNAPSHOT_EVERY = 50
+
 # 设置日志格式
 log_file = "crawler.log"
+file_handler = logging.FileHandler(log_file, encoding='utf-8')
+file_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
 logging.basicConfig(
     level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
     handlers=[
-        logging.FileHandler(log_file, encoding='utf-8')
+        # 日志先在内存中攒批再写入文件，避免每条日志都触发一次磁盘写入；ERROR及以上立即写入
+        logging.handlers.MemoryHandler(capacity=100, flushLevel=logging.ERROR, target=file_handler)
     ]
 )
 logger = logging.getLogger(__name__)
@@ -30,11 +57,58 @@ for name in logging.root.manager.loggerDict:
     if name not in ['__main__', 'crawler']:
         logging.getLogger(name).setLevel(logging.CRITICAL)
 
+# 保留urllib3的"连接池已满"警告，便于发现连接池大小不足导致的重复建连
+pool_logger = logging.getLogger('urllib3.connectionpool')
+pool_logger.setLevel(logging.WARNING)
+pool_logger.addFilter(lambda record: 'Connection pool is full' in record.getMessage())
+
+def has_complete_signature(head, tail):
+    """根据文件头尾字节快速判断JPEG/PNG/GIF图片是否完整；无法确认时返回False，交由PIL进一步校验"""
+    if head.startswith(b'\xff\xd8\xff'):
+        return tail.endswith(b'\xff\xd9')
+    if head.startswith(b'\x89PNG\r\n\x1a\n'):
+        return tail.endswith(b'IEND\xaeB`\x82')
+    if head[:6] in (b'GIF87a', b'GIF89a'):
+        # 结尾的';'前必须是数据块结束符0x00，只有一个';'可能只是截断处碰巧的字节
+        return tail.endswith(b'\x00;')
+    return False
+
+class TokenBucket:
+    """令牌桶限速器，按固定速率补充令牌，令牌不足时等待"""
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+    
+    def acquire(self):
+        """获取一个令牌，必要时阻塞到令牌可用"""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.last) * self.rate)
+            self.last = now
+            # 先预支令牌，令牌为负时按欠额计算等待时间，保证并发线程依次排队
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        if wait > 0:
+            time.sleep(wait)
+
 class GalleryCrawler:
-    def __init__(self, save_path, verify=False):
+    def __init__(self, save_path, verify=False, max_workers=None, img_max_workers=None):
         self.save_path = save_path
         self.verify = verify
+        # 并发数：相册级并发和相册内图片级并发，未指定时随机取3-5
+        self.max_workers = max_workers or random.randint(3, 5)
+        self.img_max_workers = img_max_workers or random.randint(3, 5)
         self.session = self._create_session()
+        # 所有相册共用一个长期存在的图片线程池，避免每个相册反复创建、销毁线程
+        self._img_pool = concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.max_workers * self.img_max_workers, thread_name_prefix='img')
+        
+        # 按主机划分的令牌桶
+        self._host_buckets = {}
+        self._host_buckets_lock = threading.Lock()
         
         # 初始化列表
         self.waiting_list = []
@@ -45,17 +119,62 @@ class GalleryCrawler:
         # 创建保存目录
         if not os.path.exists(self.save_path):
             os.makedirs(self.save_path)
+        
+        # 已完成相册的快照，中断后重新运行时直接跳过这些相册
+        self.completed_file = os.path.join(self.save_path, 'completed_albums.json')
+        self.completed_urls = self._load_completed()
+        self._completed_lock = threading.Lock()
+        self._completed_dirty = 0
+        # 程序被中断（如Ctrl+C）时也写入快照
+        atexit.register(self._save_completed)
+    
+    def _load_completed(self):
+        """读取已完成相册快照"""
+        if not os.path.exists(self.completed_file):
+            return set()
+        try:
+            with open(self.completed_file, 'r', encoding='utf-8') as f:
+                return set(json.load(f))
+        except (OSError, ValueError) as e:
+            logger.error(f"读取已完成相册快照失败: {e}")
+            return set()
+    
+    def _save_completed(self):
+        """原子化写入已完成相册快照（临时文件 + os.replace）"""
+        with self._completed_lock:
+            temp_path = self.completed_file + '.tmp'
+            try:
+                with open(temp_path, 'w', encoding='utf-8') as f:
+                    json.dump(sorted(self.completed_urls), f, ensure_ascii=False)
+                os.replace(temp_path, self.completed_file)
+                self._completed_dirty = 0
+            except OSError as e:
+                logger.error(f"写入已完成相册快照失败: {e}")
+    
+    def _mark_completed(self, album_url):
+        """记录已完成的相册，每累计一定数量写一次快照"""
+        with self._completed_lock:
+            self.completed_urls.add(album_url)
+            self._completed_dirty += 1
+            should_save = self._completed_dirty >= COMPLETED_SNAPSHOT_EVERY
+        if should_save:
+            self._save_completed()
     
     def _create_session(self):
         """创建带连接池和重试机制的session"""
         session = requests.Session()
         retry = Retry(
             total=5,
+            # 连接和读取错误交给download_image的重试循环处理，避免两层重试次数相乘
+            connect=0,
+            read=0,
             backoff_factor=1,
             status_forcelist=[429, 500, 502, 503, 504],
             allowed_methods=["HEAD", "GET", "OPTIONS"]
         )
-        adapter = HTTPAdapter(max_retries=retry, pool_connections=100, pool_maxsize=100)
+        # 连接池大小不小于同时进行的图片下载数（相册并发 × 图片并发），保证keep-alive连接都能复用
+        pool_size = max(32, self.max_workers * self.img_max_workers)
+        adapter = HTTPAdapter(max_retries=retry, pool_connections=pool_size, pool_maxsize=pool_size)
         session.mount("http://", adapter)
         session.mount("https://", adapter)
         # 设置headers模拟浏览器
@@ -64,6 +183,25 @@ class GalleryCrawler:
         })
         return session
     
+    def close(self):
+        """关闭共享图片线程池和会话"""
+        self._img_pool.shutdown(wait=True)
+        self.session.close()
+    
+    def _throttle(self, url):
+        """按主机限速，只有该主机的请求过于密集时才会等待"""
+        host = urlparse(url).netloc
+        with self._host_buckets_lock:
+            bucket = self._host_buckets.get(host)
+            if bucket is None:
+                bucket = self._host_buckets[host] = TokenBucket(HOST_RATE, HOST_BURST)
+        bucket.acquire()
+    
+    def _get(self, url, **kwargs):
+        """按主机限速后发送GET请求，所有页面和图片请求共享同一限速额度"""
+        self._throttle(url)
+        return self.session.get(url, **kwargs)
+    
     def _sanitize_filename(self, filename):
         """清理文件名，将特殊字符替换为空格"""
         return re.sub(r'[\\/:*?"<>|]', ' ', filename)
@@ -72,43 +210,41 @@ class GalleryCrawler:
         """获取所有相册链接和名称"""
         base_url = "https://xxtu.org/"
         albums = []
+        seen_album_urls = set()
         page = 1
         max_pages = 100  # 设置较大的最大页数限制，确保获取所有相册
         
+        def page_url(n):
+            """构建分页URL"""
+            return base_url if n == 1 else f"{base_url}?paged={n}"
+        
+        # 预取下一页：解析当前页的同时，下一页的请求已在后台进行
+        prefetcher = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix='prefetch')
+        prefetched = {}
+        first_page_size = None
+        
         logger.info("开始获取所有相册...")
         print("🚀 开始获取所有相册...")
         
         while page <= max_pages:
             try:
-                # 构建分页URL
-                if page == 1:
-                    current_url = base_url
-                else:
-                    current_url = f"{base_url}?paged={page}"
+                current_url = page_url(page)
                 
                 logger.info(f"正在获取第 {page} 页相册，URL: {current_url}")
                 print(f"📄 正在获取第 {page} 页相册，URL: {current_url}")
-                # 随机延迟4-8秒
-                delay = random.uniform(4, 8)
-                print(f"⏱️  随机延迟 {delay:.1f} 秒...")
-                time.sleep(delay)
-                
-                # 获取页面内容
+                # 获取页面内容（优先使用已预取的请求）
                 start_time = time.time()
-                response = self.session.get(current_url, timeout=30)
+                future = prefetched.pop(page, None)
+                if future is None:
+                    future = prefetcher.submit(self._get, current_url, timeout=30)
+                response = future.result()
                 response.raise_for_status()
-                end_time = time.time()
-                
-                # 计算下载速度
-                content_length = len(response.content)
-                elapsed_time = end_time - start_time
-                if elapsed_time > 0:
-                    speed = content_length / elapsed_time / 1024  # KB/s
-                    print(f"📥 页面下载完成，大小: {content_length/1024:.1f} KB，耗时: {elapsed_time:.2f} 秒，速度: {speed:.1f} KB/s")
+                elapsed_time = time.time() - start_time
+                print(f"📥 页面获取完成，大小: {len(response.content)/1024:.1f} KB，等待: {elapsed_time:.2f} 秒")
                 
                 # 解析页面
                 print(f"🔍 正在解析页面...")
-                soup = BeautifulSoup(response.text, 'html.parser')
+                soup = BeautifulSoup(response.content, HTML_PARSER)
                 
                 # 查找所有相册项 - 优化选择器，确保能找到所有相册项
                 album_items = soup.find_all('article')
@@ -124,6 +260,14 @@ class GalleryCrawler:
                 
                 print(f"✅ 找到 {len(album_items)} 个相册项")
                 
+                # 当前页有下一页链接或是满页（相册数不少于首页）时才预取下一页，提取相册信息的同时下一页请求在后台进行
+                # 最后一页不会多发一次请求；预取只在本页成功后提交，重试本页时不会留下重复的预取请求
+                if first_page_size is None:
+                    first_page_size = len(album_items)
+                has_next = soup.find(['a', 'link'], rel='next') or soup.find('a', class_='next')
+                if page < max_pages and (has_next or len(album_items) >= first_page_size):
+                    prefetched[page + 1] = prefetcher.submit(self._get, page_url(page + 1), timeout=30)
+                
                 # 提取相册信息
                 new_albums = 0
                 print(f"📸 正在提取相册信息...")
@@ -132,13 +276,8 @@ class GalleryCrawler:
                     a_tag = item.find('a')
                     if a_tag and 'href' in a_tag.attrs:
                         album_url = a_tag['href']
-                        # 查找相册名称
-                        title_tag = item.find('h2', class_='entry-title')
-                        if not title_tag:
-                            # 尝试其他可能的标题标签
-                            title_tag = item.find('h1', class_='entry-title')
-                            if not title_tag:
-                                title_tag = item.find('h3', class_='entry-title')
+                        # 查找相册名称（h2/h1/h3标题标签，一次遍历）
+                        title_tag = item.find(['h2', 'h1', 'h3'], class_='entry-title')
                         
                         if title_tag:
                             album_name = title_tag.text.strip()
@@ -146,8 +285,8 @@ class GalleryCrawler:
                             sanitized_name = self._sanitize_filename(album_name)
                             
                             # 检查是否已存在该相册
-                            album_exists = any(existing_album[2] == album_url for existing_album in albums)
-                            if not album_exists:
+                            if album_url not in seen_album_urls:
+                                seen_album_urls.add(album_url)
                                 albums.append((sanitized_name, album_name, album_url))
                                 new_albums += 1
                                 print(f"🎉 检索到相册: {album_name}")
@@ -196,6 +335,9 @@ class GalleryCrawler:
                 traceback.print_exc()
                 break
         
+        # 丢弃未使用的预取请求
+        prefetcher.shutdown(wait=False, cancel_futures=True)
+        
         logger.info(f"共找到 {len(albums)} 个相册")
         print(f"🎉 相册检索完成，共找到 {len(albums)} 个相册")
         return albums
@@ -203,10 +345,19 @@ class GalleryCrawler:
     def validate_image(self, image_path):
         """验证图片是否损坏"""
         # 检查文件大小
-        if os.path.getsize(image_path) == 0:
+        file_size = os.path.getsize(image_path)
+        if file_size == 0:
             logger.error(f"图片 {image_path} 大小为0")
             return False
         
+        # 快速校验：只读取文件头尾，格式标记完整则无需完整解析
+        with open(image_path, 'rb') as f:
+            head = f.read(16)
+            f.seek(max(file_size - 16, 0))
+            tail = f.read()
+        if has_complete_signature(head, tail):
+            return True
+        
         # 验证图片完整性
         try:
             with Image.open(image_path) as img:
@@ -216,6 +367,19 @@ class GalleryCrawler:
             logger.error(f"图片 {image_path} 损坏: {e}")
             return False
     
+    def validate_image_bytes(self, data, image_url):
+        """验证内存中的图片数据是否损坏"""
+        if has_complete_signature(data[:16], data[-16:]):
+            return True
+        
+        try:
+            with Image.open(io.BytesIO(data)) as img:
+                img.verify()
+            return True
+        except Exception as e:
+            logger.error(f"图片 {image_url} 损坏: {e}")
+            return False
+    
     def download_image(self, image_url, save_path):
         """下载单张图片"""
         retry_count = 0
@@ -225,15 +389,23 @@ class GalleryCrawler:
         print(f"📥 开始下载图片: {img_name}")
         
         while retry_count < max_retries:
+            response = None
             try:
-                # 随机延迟4-8秒
-                delay = random.uniform(4, 8)
-                print(f"⏱️  随机延迟 {delay:.1f} 秒...")
-                time.sleep(delay)
+                # 再次检查文件是否已存在（避免并发下载同一文件），已完整则无需发起请求
+                if os.path.exists(save_path):
+                    if self.validate_image(save_path):
+                        info_msg = f"✅ 图片已存在且完整，跳过下载"
+                        logger.info(f"图片 {image_url} 已存在且完整，跳过下载")
+                        print(info_msg)
+                        return True
+                    else:
+                        info_msg = f"🔄 图片已存在但损坏，重新下载"
+                        logger.info(f"图片 {image_url} 已存在但损坏，重新下载")
+                        print(info_msg)
                 
                 # 发送请求
                 print(f"🔗 正在连接: {image_url}")
-                response = self.session.get(image_url, timeout=60, stream=True)
+                response = self._get(image_url, timeout=60, stream=True)
                 response.raise_for_status()
                 
                 # 验证响应状态码
@@ -254,51 +426,38 @@ class GalleryCrawler:
                     retry_count += 1
                     continue
                 
-                # 再次检查文件是否已存在（避免并发下载同一文件）
-                if os.path.exists(save_path):
-                    if self.validate_image(save_path):
-                        info_msg = f"✅ 图片已存在且完整，跳过下载"
-                        logger.info(f"图片 {image_url} 已存在且完整，跳过下载")
-                        print(info_msg)
-                        return True
-                    else:
-                        info_msg = f"🔄 图片已存在但损坏，重新下载"
-                        logger.info(f"图片 {image_url} 已存在但损坏，重新下载")
-                        print(info_msg)
-                
                 # 获取文件大小
                 content_length = response.headers.get('Content-Length')
                 total_size = int(content_length) if content_length else 0
                 if total_size > 0:
                     print(f"📊 文件大小: {total_size/1024:.1f} KB")
                 
-                # 原子化写入文件
-                temp_path = save_path + '.tmp'
-                
-                # 下载并保存文件
-                print(f"💾 正在保存到: {save_path}")
+                # 下载到内存缓冲区，校验通过后一次性写入磁盘
+                print(f"💾 正在下载: {img_name}")
                 start_time = time.time()
-                downloaded_size = 0
-                with open(temp_path, 'wb') as f:
-                    for chunk in response.iter_content(chunk_size=8192):
-                        if chunk:
-                            f.write(chunk)
-                            downloaded_size += len(chunk)
-                            
-                            # 计算并显示下载进度和速度
-                            elapsed_time = time.time() - start_time
-                            if elapsed_time > 0.5:  # 每0.5秒更新一次进度
-                                speed = downloaded_size / elapsed_time / 1024  # KB/s
-                                if total_size > 0:
-                                    progress = downloaded_size / total_size * 100
-                                    print(f"📊 下载进度: {progress:.1f}% ({downloaded_size/1024:.1f} KB/{total_size/1024:.1f} KB)，速度: {speed:.1f} KB/s", end='\r')
-                                else:
-                                    print(f"📊 下载进度: {downloaded_size/1024:.1f} KB，速度: {speed:.1f} KB/s", end='\r')
+                last_print_time = start_time
+                buffer = bytearray()
+                for chunk in response.iter_content(chunk_size=256 * 1024):
+                    if chunk:
+                        buffer += chunk
+                        downloaded_size = len(buffer)
+                        
+                        # 计算并显示下载进度和速度，每0.5秒最多输出一次
+                        now = time.time()
+                        if now - last_print_time >= 0.5:
+                            last_print_time = now
+                            elapsed_time = now - start_time
+                            speed = downloaded_size / elapsed_time / 1024  # KB/s
+                            if total_size > 0:
+                                progress = downloaded_size / total_size * 100
+                                print(f"📊 下载进度: {progress:.1f}% ({downloaded_size/1024:.1f} KB/{total_size/1024:.1f} KB)，速度: {speed:.1f} KB/s", end='\r')
+                            else:
+                                print(f"📊 下载进度: {downloaded_size/1024:.1f} KB，速度: {speed:.1f} KB/s", end='\r')
                 
                 # 下载完成，计算总速度
                 end_time = time.time()
                 elapsed_time = end_time - start_time
-                total_downloaded = downloaded_size
+                total_downloaded = len(buffer)
                 if elapsed_time > 0:
                     speed = total_downloaded / elapsed_time / 1024  # KB/s
                     info_msg = f"📊 下载完成，耗时: {elapsed_time:.2f} 秒，速度: {speed:.1f} KB/s"
@@ -310,14 +469,12 @@ class GalleryCrawler:
                     error_msg = f"❌ 下载后文件大小为0"
                     logger.error(f"图片 {image_url} 下载后文件大小为0")
                     print(f"\n{error_msg}")
-                    os.remove(temp_path)
                     retry_count += 1
                     continue
                 
                 # 简单验证文件开头的魔法数字
                 print(f"🔍 正在验证图片完整性...")
-                with open(temp_path, 'rb') as f:
-                    magic_number = f.read(8)
+                magic_number = bytes(buffer[:8])
                 
                 # 常见图片格式的魔法数字
                 valid_magic_numbers = {
@@ -337,38 +494,31 @@ class GalleryCrawler:
                     error_msg = f"❌ 图片魔法数字无效: {magic_number}"
                     logger.error(f"图片 {image_url} 魔法数字无效: {magic_number}")
                     print(error_msg)
-                    os.remove(temp_path)
                     retry_count += 1
                     continue
                 
-                # 验证图片完整性
-                if self.validate_image(temp_path):
-                    try:
-                        os.rename(temp_path, save_path)
-                        success_msg = f"✅ 图片下载完成: {img_name}"
-                        print(success_msg)
-                        return True
-                    except FileExistsError:
-                        # 如果文件在下载过程中被其他线程创建，再次验证
-                        os.remove(temp_path)
-                        if os.path.exists(save_path):
-                            if self.validate_image(save_path):
-                                info_msg = f"✅ 图片已被其他线程下载完成，跳过"
-                                logger.info(f"图片 {image_url} 已被其他线程下载完成，跳过")
-                                print(info_msg)
-                                return True
-                            else:
-                                error_msg = f"❌ 图片已存在但损坏，需要重新下载"
-                                logger.error(f"图片 {image_url} 已存在但损坏，需要重新下载")
-                                print(error_msg)
-                                retry_count += 1
-                                continue
+                # 验证图片完整性（直接校验内存中的数据，无需回读文件）
+                if self.validate_image_bytes(buffer, image_url):
+                    # 原子化写入文件
+                    temp_path = save_path + '.tmp'
+                    print(f"💾 正在保存到: {save_path}")
+                    with open(temp_path, 'wb') as f:
+                        f.write(buffer)
+                    os.replace(temp_path, save_path)
+                    success_msg = f"✅ 图片下载完成: {img_name}"
+                    print(success_msg)
+                    return True
                 else:
                     error_msg = f"❌ 图片下载后损坏，正在重试... ({retry_count+1}/{max_retries})"
                     logger.error(f"图片 {image_url} 下载后损坏，正在重试... ({retry_count+1}/{max_retries})")
                     print(error_msg)
-                    os.remove(temp_path)
                     retry_count += 1
+            except (requests.exceptions.HTTPError, requests.exceptions.RetryError) as e:
+                # 可重试的状态码已由session的Retry退避重试过，其余状态码（如404）重试也没有意义
+                error_msg = f"❌ 图片请求失败，不再重试: {e}"
+                logger.error(f"图片 {image_url} 请求失败，不再重试: {e}")
+                print(error_msg)
+                break
             except requests.exceptions.RequestException as e:
                 retry_count += 1
                 error_msg = f"❌ 网络请求失败: {e}，正在重试... ({retry_count}/{max_retries})"
@@ -384,6 +534,10 @@ class GalleryCrawler:
                 import traceback
                 traceback.print_exc()
                 time.sleep(random.uniform(4, 8))
+            finally:
+                # 及时释放流式响应，让连接回到连接池复用，而不是等待垃圾回收
+                if response is not None:
+                    response.close()
         
         error_msg = f"❌ 图片下载失败: {img_name}"
         print(error_msg)
@@ -398,6 +552,13 @@ class GalleryCrawler:
         print(f"📚 相册链接: {album_url}")
         logger.info(f"开始下载相册: {original_name}")
         
+        # 上次运行已完整下载的相册直接跳过（验证模式下仍重新检查）
+        if album_url in self.completed_urls and not self.verify:
+            print(f"✅ 相册已完成，跳过: {original_name}")
+            logger.info(f"相册 {original_name} 已完成，跳过")
+            self.completed_list.append(original_name)
+            return True
+        
         # 将相册添加到正在下载列表
         self.downloading_list.append(original_name)
         
@@ -408,30 +569,24 @@ class GalleryCrawler:
             os.makedirs(album_dir)
         
         try:
-            # 随机延迟4-8秒
-            delay = random.uniform(4, 8)
-            print(f"⏱️  随机延迟 {delay:.1f} 秒...")
-            time.sleep(delay)
-            
             # 获取相册页面内容
             print(f"🔗 获取相册页面内容...")
-            response = self.session.get(album_url, timeout=30)
+            response = self._get(album_url, timeout=30)
             response.raise_for_status()
             
             # 解析相册页面，获取所有图片链接
             print(f"🔍 解析相册页面，提取图片链接...")
-            soup = BeautifulSoup(response.text, 'html.parser')
-            image_tags = soup.find_all('img')
-            image_urls = []
+            soup = BeautifulSoup(response.content, HTML_PARSER, parse_only=IMG_ONLY)
+            # 单次遍历完成过滤、命名和去重：只保留jpg, jpeg, png, gif，
+            # 使用原文件名保存图片，同名文件只保留第一次出现的链接，避免多个线程写同一个文件
+            images = {}
+            for img in soup.find_all('img', src=True):
+                img_url = img['src']
+                match = IMAGE_URL_RE.search(img_url)
+                if match:
+                    images.setdefault(match.group(1), img_url)
             
-            for img in image_tags:
-                if 'src' in img.attrs:
-                    img_url = img['src']
-                    # 过滤掉不需要的图片（只保留jpg, jpeg, png, gif）
-                    if img_url.endswith(('.jpg', '.jpeg', '.png', '.gif')):
-                        image_urls.append(img_url)
-            
-            total_images = len(image_urls)
+            total_images = len(images)
             print(f"📸 相册包含 {total_images} 张图片")
             logger.info(f"相册 {original_name} 包含 {total_images} 张图片")
             
@@ -440,51 +595,48 @@ class GalleryCrawler:
             skip_count = 0
             fail_count = 0
             
-            # 限制图片级并发数，避免并发过高
-            img_max_workers = random.randint(3, 5)
-            print(f"🚀 开始下载相册中的图片，使用 {img_max_workers} 个图片并发线程...")
-            with concurrent.futures.ThreadPoolExecutor(max_workers=img_max_workers) as executor:
-                futures = {}
-                for i, img_url in enumerate(image_urls):
-                    # 使用原文件名保存图片
-                    img_name = os.path.basename(img_url.split('?')[0])
-                    img_path = os.path.join(album_dir, img_name)
-                    
-                    # 如果图片已存在且验证通过，则跳过
-                    if os.path.exists(img_path):
-                        if self.validate_image(img_path):
-                            skip_msg = f"✅ 图片 {img_name} 已存在且完整，跳过下载"
-                            print(skip_msg)
-                            logger.info(f"[{original_name}] 图片 {img_name} 已存在且完整，跳过下载")
-                            skip_count += 1
-                            success_count += 1
-                            continue
-                        else:
-                            print(f"🔄 图片 {img_name} 已存在但损坏，重新下载")
-                            logger.info(f"[{original_name}] 图片 {img_name} 已存在但损坏，重新下载")
-                    
-                    future = executor.submit(self.download_image, img_url, img_path)
-                    futures[future] = (img_url, img_name)
-                
-                # 等待所有图片下载完成
-                total_futures = len(futures)
-                completed_futures = 0
-                
-                for future in concurrent.futures.as_completed(futures):
-                    completed_futures += 1
-                    img_url, img_name = futures[future]
-                    try:
-                        result = future.result()
-                        if result:
-                            success_count += 1
-                            print(f"📊 相册进度: {completed_futures}/{total_futures} 张，成功: {success_count}, 失败: {fail_count}, 跳过: {skip_count}")
-                        else:
-                            fail_count += 1
-                            print(f"📊 相册进度: {completed_futures}/{total_futures} 张，成功: {success_count}, 失败: {fail_count}, 跳过: {skip_count}")
-                    except Exception as e:
+            print(f"🚀 开始下载相册中的图片，提交到共享图片线程池...")
+            jobs = []
+            for img_name, img_url in images.items():
+                img_path = os.path.join(album_dir, img_name)
+                
+                # 如果图片已存在且验证通过，则跳过
+                if os.path.exists(img_path):
+                    if self.validate_image(img_path):
+                        skip_msg = f"✅ 图片 {img_name} 已存在且完整，跳过下载"
+                        print(skip_msg)
+                        logger.info(f"[{original_name}] 图片 {img_name} 已存在且完整，跳过下载")
+                        skip_count += 1
+                        success_count += 1
+                        continue
+                    else:
+                        print(f"🔄 图片 {img_name} 已存在但损坏，重新下载")
+                        logger.info(f"[{original_name}] 图片 {img_name} 已存在但损坏，重新下载")
+                
+                jobs.append((img_url, img_path, img_name))
+            
+            # 等待所有图片下载完成；线程池由所有相册共享，每个相册同时最多占用img_max_workers个线程
+            total_futures = len(jobs)
+            completed_futures = 0
+            last_print_time = 0
+            
+            for (img_url, img_path, img_name), future in self._bounded_map(
+                    self._img_pool, lambda job: self.download_image(job[0], job[1]), jobs, self.img_max_workers):
+                completed_futures += 1
+                try:
+                    if future.result():
+                        success_count += 1
+                    else:
                         fail_count += 1
-                        print(f"📊 相册进度: {completed_futures}/{total_futures} 张，成功: {success_count}, 失败: {fail_count}, 跳过: {skip_count}")
-                        logger.error(f"[{original_name}] 处理图片 {img_name} 时出错: {e}")
+                except Exception as e:
+                    fail_count += 1
+                    logger.error(f"[{original_name}] 处理图片 {img_name} 时出错: {e}")
+                
+                # 相册进度每0.5秒最多输出一次，最后一张一定输出
+                now = time.time()
+                if now - last_print_time >= 0.5 or completed_futures == total_futures:
+                    last_print_time = now
+                    print(f"📊 相册进度: {completed_futures}/{total_futures} 张，成功: {success_count}, 失败: {fail_count}, 跳过: {skip_count}")
             
             # 下载完成总结
             summary_msg = f"🎉 相册下载完成: {original_name}"
@@ -498,6 +650,10 @@ class GalleryCrawler:
             self.downloading_list.remove(original_name)
             self.completed_list.append(original_name)
             
+            # 所有图片都成功才记为已完成，下次运行跳过
+            if total_images > 0 and fail_count == 0:
+                self._mark_completed(album_url)
+            
             return True
         except requests.exceptions.RequestException as e:
             error_msg = f"❌ 网络请求失败，处理相册 {original_name} 时出错: {e}"
@@ -518,6 +674,23 @@ class GalleryCrawler:
             self.failed_list.append(original_name)
             return False
     
+    @staticmethod
+    def _bounded_map(executor, fn, items, limit):
+        """最多同时提交limit个任务，按完成顺序产出(item, future)，完成一个再补一个"""
+        items = iter(items)
+        pending = {}
+        for item in items:
+            pending[executor.submit(fn, item)] = item
+            if len(pending) >= limit:
+                break
+        while pending:
+            done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                yield pending.pop(future), future
+                next_item = next(items, None)
+                if next_item is not None:
+                    pending[executor.submit(fn, next_item)] = next_item
+    
     def run(self):
         """主运行函数"""
         start_time = time.time()
@@ -534,28 +707,22 @@ class GalleryCrawler:
         self.waiting_list = [album[1] for album in albums]
         print(f"📋 待下载列表已更新，共 {len(self.waiting_list)} 个相册")
         
-        # 并发下载相册（3-5个并发）
-        max_workers = random.randint(3, 5)
+        # 并发下载相册
+        max_workers = self.max_workers
         print(f"\n🎯 阶段2: 开始下载相册")
         print(f"⚡ 使用 {max_workers} 个并发线程")
-        print(f"📝 下载策略: 每个相册随机延迟4-8秒，每个图片随机延迟4-8秒")
+        print(f"📝 下载策略: 所有请求按主机限速（每秒 {HOST_RATE} 个，突发 {HOST_BURST} 个），失败后随机等待4-8秒重试")
         
         # 简单下载，不使用复杂的进度监控
         with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
             print(f"\n📊 全局进度监控:")
             print(f"开始下载...")
             
-            # 执行下载
-            futures = {}
-            for i, album in enumerate(albums):
-                future = executor.submit(self.download_album, album)
-                futures[future] = album[1]
-            
-            # 实时监控进度
+            # 执行下载并实时监控进度，只保持与线程数相当的相册在排队
             completed_albums = 0
-            for future in concurrent.futures.as_completed(futures):
+            for album, future in self._bounded_map(executor, self.download_album, albums, max_workers * 2):
                 completed_albums += 1
-                album_name = futures[future]
+                album_name = album[1]
                 
                 # 计算当前进度
                 progress = completed_albums / total_albums * 100
@@ -581,11 +748,9 @@ class GalleryCrawler:
             if user_input == 'y':
                 print("\n🔄 开始重试失败的相册...")
                 
-                # 准备重试的相册列表
-                retry_albums = []
-                for album in albums:
-                    if album[1] in self.failed_list:
-                        retry_albums.append(album)
+                # 准备重试的相册列表（先转为集合，避免每个相册都线性查找失败列表）
+                failed_names = set(self.failed_list)
+                retry_albums = [album for album in albums if album[1] in failed_names]
                 
                 print(f"📋 准备重试 {len(retry_albums)} 个失败的相册")
                 
@@ -594,20 +759,18 @@ class GalleryCrawler:
                 
                 # 重试下载
                 with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-                    futures = {}
-                    for album in retry_albums:
-                        future = executor.submit(self.download_album, album)
-                        futures[future] = album[1]
-                    
                     # 实时监控重试进度
                     completed_retry = 0
                     total_retry = len(retry_albums)
-                    for future in concurrent.futures.as_completed(futures):
+                    for album, future in self._bounded_map(executor, self.download_album, retry_albums, max_workers * 2):
                         completed_retry += 1
-                        album_name = futures[future]
+                        album_name = album[1]
                         progress = completed_retry / total_retry * 100
                         print(f"📊 重试进度: {progress:.1f}% ({completed_retry}/{total_retry} 个相册)")
         
+        # 写入最终的已完成相册快照
+        self._save_completed()
+        
         # 计算总耗时
         total_time = time.time() - start_time
         
@@ -660,6 +823,8 @@ def main():
     parser = argparse.ArgumentParser(description="魅影图库爬虫")
     parser.add_argument('--save-path', type=str, default="E:achong果影图库    xxtu.org", help="图片保存路径")
     parser.add_argument('--verify', action='store_true', help="验证并修复已存在的损坏文件")
+    parser.add_argument('--max-workers', type=int, default=None, help="并发下载的相册数量（默认随机3-5）")
+    parser.add_argument('--img-max-workers', type=int, default=None, help="每个相册内并发下载的图片数量（默认随机3-5）")
     args = parser.parse_args()
     
     # 询问用户保存地址，若留空则使用默认
@@ -675,14 +840,17 @@ def main():
         print(f"使用默认保存路径: {save_path}")
     
     # 初始化爬虫
-    crawler = GalleryCrawler(save_path, args.verify)
+    crawler = GalleryCrawler(save_path, args.verify, args.max_workers, args.img_max_workers)
     
     # 如果启用了验证模式，则先验证已存在的文件
     if args.verify:
         crawler.verify_existing_files()
     
     # 开始爬取
-    crawler.run()
+    try:
+        crawler.run()
+    finally:
+        crawler.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file